@@ -15,6 +15,7 @@ engine_v2.py — The Closer's Refactored Quant Engine
 from __future__ import annotations
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 
@@ -31,6 +32,12 @@ try:
 except ImportError:
     _TA_AVAILABLE = False
 
+try:
+    from numba import njit as _numba_njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -371,6 +378,8 @@ class DataClient:
 
     # 🚨 최소 행 수를 10으로 낮춰 데이터 누락 시에도 분석을 강행
     MIN_ROWS = 10
+    # 야후 차트 엔드포인트가 한 번에 안정적으로 받아주는 심볼 수
+    BATCH_SIZE = 20
 
     def fetch(self, ticker: str, period: str = "6mo") -> pd.DataFrame:
         try:
@@ -382,8 +391,59 @@ class DataClient:
 
         return self._clean(df, ticker)
 
+    def fetch_many(self, tickers: List[str], period: str = "1y", threads: bool = True) -> Dict[str, pd.DataFrame]:
+        """
+        여러 종목을 yf.download 묶음 요청(BATCH_SIZE 단위)으로 한 번에 수집.
+        threads=False 면 묶음 내부 병렬 요청을 끕니다 (호출부가 이미 묶음 단위로 병렬화한 경우).
+
+        Returns:
+            {ticker: 정제된 DataFrame}. 묶음 응답에서 빠졌거나 행 수가 부족한 종목은
+            결과에 포함되지 않으므로, 호출부에서 fetch()로 개별 재시도하면 됩니다.
+        """
+        frames: Dict[str, pd.DataFrame] = {}
+        for start in range(0, len(tickers), self.BATCH_SIZE):
+            frames.update(self._download_batch(tickers[start:start + self.BATCH_SIZE], period, threads))
+        return frames
+
     # ── 내부 헬퍼 ──────────────────────────────
 
+    def _download_batch(self, tickers: List[str], period: str, threads: bool = True) -> Dict[str, pd.DataFrame]:
+        """심볼 묶음 1회 요청 → 종목별 DataFrame 분리."""
+        try:
+            raw = yf.download(
+                list(tickers), period=period, interval="1d", group_by="ticker",
+                auto_adjust=False, threads=threads, progress=False,
+            )
+        except Exception as exc:
+            logger.warning("묶음 다운로드 실패 (%d종목): %s", len(tickers), exc)
+            return {}
+        if raw is None or raw.empty:
+            return {}
+
+        is_multi = isinstance(raw.columns, pd.MultiIndex)
+        available = set(raw.columns.get_level_values(0)) if is_multi else set()
+
+        frames: Dict[str, pd.DataFrame] = {}
+        for ticker in tickers:
+            if is_multi:
+                if ticker not in available:
+                    continue
+                df = raw[ticker]
+            elif len(tickers) == 1:
+                df = raw
+            else:
+                continue
+
+            # 시장별 휴장일이 섞인 행(전부 NaN)은 해당 종목 기준으로 제거
+            df = df.dropna(how="all")
+            if len(df) < self.MIN_ROWS:
+                continue
+            try:
+                frames[ticker] = self._clean(df.copy(), ticker)
+            except InsufficientDataError:
+                continue
+        return frames
+
     def _try_download(self, stock: yf.Ticker, period: str) -> pd.DataFrame:
         """데이터 확보를 위해 시도 횟수를 늘리고 기간을 유연하게 조정."""
         # 'max'와 '1mo'를 추가하여 어떻게든 데이터를 긁어옴
@@ -415,6 +475,35 @@ class DataClient:
         return df
 
 
+# ─────────────────────────────────────────────
+# 봉 단위 누적 루프 커널 (numba 있으면 JIT, 없으면 순수 Python)
+# ─────────────────────────────────────────────
+
+def _njit(func):
+    """numba 가 설치돼 있으면 @njit(cache=True) 로 컴파일, 없으면 원본 함수를 그대로 반환."""
+    if _NUMBA_AVAILABLE:
+        return _numba_njit(cache=True)(func)
+    return func
+
+
+@_njit
+def _wilder_atr_loop(true_range: np.ndarray, window: int) -> np.ndarray:
+    """
+    Wilder 평활 ATR. ta.volatility.AverageTrueRange 와 같은 점화식:
+    atr[w-1] = mean(tr[:w]),  atr[i] = (atr[i-1]*(w-1) + tr[i]) / w
+    (ta 는 이 루프를 Series.iloc 로 돌려 봉마다 pandas 인덱싱 비용이 듦)
+    """
+    n = true_range.shape[0]
+    atr = np.zeros(n)
+    acc = 0.0
+    for i in range(window):
+        acc += true_range[i]
+    atr[window - 1] = acc / window
+    for i in range(window, n):
+        atr[i] = (atr[i - 1] * (window - 1) + true_range[i]) / window
+    return atr
+
+
 # ─────────────────────────────────────────────
 # 지표 계산 계층
 # ─────────────────────────────────────────────
@@ -436,45 +525,50 @@ class IndicatorEngine:
         low    = df["Low"].astype(float)
         volume = df["Volume"].astype(float)
 
-        rsi_s    = self._rsi(close)
-        mfi_s    = self._mfi(high, low, close, volume)
         bb_lo, bb_hi = self._bb(close)
         macd_line, macd_sig, macd_diff_s = self._macd(close)
         ichi_a_s, ichi_b_s = self._ichimoku(high, low)
-        vwap_s   = self._vwap(high, low, close, volume)
-        obv_s    = self._obv(close, volume)
-        atr_s    = self._atr(high, low, close)
+
+        # 지표 결과를 컬럼별 float64 NumPy 배열(SoA)로 한 번만 변환
+        # → 컬럼 대입은 인덱스 정렬 없이, 스냅샷은 배열 마지막 원소로 바로 읽음
+        arrays = {
+            "rsi":       self._rsi(close),
+            "mfi":       self._mfi(high, low, close, volume),
+            "bb_lower":  bb_lo,
+            "bb_upper":  bb_hi,
+            "macd":      macd_line,
+            "macd_sig":  macd_sig,
+            "macd_diff": macd_diff_s,
+            "ichi_a":    ichi_a_s,
+            "ichi_b":    ichi_b_s,
+            "vwap":      self._vwap(high, low, close, volume),
+            "obv":       self._obv(close, volume),
+            "atr":       self._atr(high, low, close),
+        }
+        arrays = {name: s.to_numpy(dtype=np.float64) for name, s in arrays.items()}
+        last = {name: float(arr[-1]) for name, arr in arrays.items()}
 
         # DataFrame에 지표 컬럼 추가 (차트용)
-        df = df.copy()
-        df["rsi"]      = rsi_s
-        df["mfi"]      = mfi_s
-        df["bb_lower"] = bb_lo
-        df["bb_upper"] = bb_hi
-        df["macd"]     = macd_line
-        df["macd_sig"] = macd_sig
-        df["macd_diff"]= macd_diff_s
-        df["ichi_a"]   = ichi_a_s
-        df["ichi_b"]   = ichi_b_s
-        df["vwap"]     = vwap_s
-        df["obv"]      = obv_s
-        df["atr"]      = atr_s
-
-        macd_diff_val = float(macd_diff_s.iloc[-1])
+        # 컬럼을 하나씩 끼워 넣으면 블록이 12조각으로 쪼개지므로 지표 블록을 한 번에 붙임
+        # (블록 내부는 (컬럼, 행) C-order → 컬럼 하나가 연속 메모리)
+        indicators = pd.DataFrame(arrays, index=df.index)
+        df = pd.concat([df.drop(columns=list(arrays), errors="ignore"), indicators], axis=1)
+
+        macd_diff_val = last["macd_diff"]
         macd_diff_pct = abs(macd_diff_val) / curr_price * 100.0 if curr_price > 0 else 0.0
 
         snap = IndicatorSnapshot(
-            rsi          = float(rsi_s.iloc[-1]),
-            mfi          = float(mfi_s.iloc[-1]),
+            rsi          = last["rsi"],
+            mfi          = last["mfi"],
             macd_diff    = macd_diff_val,
             macd_diff_pct= macd_diff_pct,
-            bb_lower     = float(bb_lo.iloc[-1]),
-            bb_upper     = float(bb_hi.iloc[-1]),
-            ichi_a       = float(ichi_a_s.iloc[-1]),
-            ichi_b       = float(ichi_b_s.iloc[-1]),
-            vwap         = float(vwap_s.iloc[-1]),
-            atr          = float(atr_s.iloc[-1]),
-            obv          = float(obv_s.iloc[-1]),
+            bb_lower     = last["bb_lower"],
+            bb_upper     = last["bb_upper"],
+            ichi_a       = last["ichi_a"],
+            ichi_b       = last["ichi_b"],
+            vwap         = last["vwap"],
+            atr          = last["atr"],
+            obv          = last["obv"],
             current_price= curr_price,
         )
         return snap, df
@@ -552,9 +646,21 @@ class IndicatorEngine:
         return pd.Series(range(len(close)), index=close.index, dtype=float)
 
     def _atr(self, high: pd.Series, low: pd.Series, close: pd.Series) -> pd.Series:
+        window = 14
+        if len(close) >= window:
+            h = high.to_numpy(dtype=np.float64)
+            l = low.to_numpy(dtype=np.float64)
+            prev_close = np.empty_like(h)
+            prev_close[0] = np.nan
+            prev_close[1:] = close.to_numpy(dtype=np.float64)[:-1]
+            # fmax: 첫 봉처럼 전일 종가가 NaN 이면 high-low 만으로 TR 계산 (ta 의 max(axis=1) 와 동일)
+            true_range = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+            if not np.isnan(true_range).any():
+                return pd.Series(_wilder_atr_loop(true_range, window), index=close.index, name="atr")
+        # 결측 봉이 섞였거나 길이가 짧으면 기존 경로 (ta → 상수 폴백)
         if _TA_AVAILABLE:
             try:
-                return AverageTrueRange(high=high, low=low, close=close, window=14).average_true_range()
+                return AverageTrueRange(high=high, low=low, close=close, window=window).average_true_range()
             except Exception:
                 pass
         return pd.Series(float(high.iloc[-1] - low.iloc[-1]), index=close.index)
@@ -1040,20 +1146,70 @@ class StockAnalyzer:
 # [Legacy Support] 기존 engine.py 호환 함수
 # ─────────────────────────────────────────────
 
+# 종목별 재무 검증/개별 재시도를 병렬로 돌릴 때의 기본 스레드 수 (야후 밴 방지를 위해 작게 유지)
+BATCH_ANALYZE_WORKERS = 8
+
+
 def analyze_stock(ticker: str, period: str = "1y", apply_fundamental: bool = False) -> Tuple[pd.DataFrame, float, str, List[Dict], float]:
     """
     기존 engine.py 호환 래퍼 — **절대 None을 반환하지 않음**.
     데이터 수집 실패 시에도 빈 DataFrame + 0점을 반환하여
     호출부가 "이 종목은 데이터가 꼬였다"는 것을 인지할 수 있게 합니다.
     """
+    # 1. 데이터 가져오기 (실패 시 0점 반환, None 반환 금지)
+    client = DataClient()
+    try:
+        df = client.fetch(ticker, period)
+    except Exception as fetch_err:
+        return pd.DataFrame(), 0.0, f"🔴 데이터 수집 실패 ({str(fetch_err)[:30]})", [], 0.0
+
+    return analyze_stock_df(df, ticker, apply_fundamental)
+
+
+def analyze_stocks_batch(
+    tickers: List[str],
+    period: str = "1y",
+    apply_fundamental: bool = False,
+    frames: Optional[Dict[str, pd.DataFrame]] = None,
+    max_workers: int = BATCH_ANALYZE_WORKERS,
+) -> Dict[str, Tuple[pd.DataFrame, float, str, List[Dict], float]]:
+    """
+    여러 종목을 묶음 다운로드(DataClient.BATCH_SIZE 단위)로 받은 뒤 종목별 분석은 로컬에서 수행.
+    frames 를 넘기면 (이미 받아 둔 fetch_many 결과) 다운로드를 건너뜁니다.
+    묶음 응답에서 빠진 종목만 analyze_stock 으로 개별 재시도합니다.
+
+    종목별 작업에 네트워크 요청이 끼는 경우(재무 검증 .info 조회, 개별 재시도)에만
+    max_workers 개 스레드로 병렬 실행합니다. 순수 지표 계산은 GIL 때문에 순차 실행이 더 빠릅니다.
+    이미 묶음 단위로 병렬화한 호출부(시장 스캔)는 max_workers=1 로 동시 접속 수를 묶어 두십시오.
+
+    Returns:
+        {ticker: analyze_stock 과 같은 5-튜플} (입력 순서 유지)
+    """
+    if frames is None:
+        frames = DataClient().fetch_many(list(tickers), period)
+
+    def _one(t: str) -> Tuple[pd.DataFrame, float, str, List[Dict], float]:
+        if t in frames:
+            return analyze_stock_df(frames[t], t, apply_fundamental)
+        return analyze_stock(t, period, apply_fundamental)
+
+    tickers = list(tickers)
+    io_bound = apply_fundamental or any(t not in frames for t in tickers)
+    workers = min(max_workers, len(tickers))
+    if not io_bound or workers <= 1:
+        return {t: _one(t) for t in tickers}
+    # analyze_stock / analyze_stock_df 는 예외를 던지지 않고 실패 튜플을 돌려주므로 map 으로 충분
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(tickers, executor.map(_one, tickers)))
+
+
+def analyze_stock_df(df: pd.DataFrame, ticker: str, apply_fundamental: bool = False) -> Tuple[pd.DataFrame, float, str, List[Dict], float]:
+    """
+    이미 수집·정제된 OHLCV DataFrame(DataClient.fetch / fetch_many 결과)으로 분석만 수행.
+    가격 데이터 네트워크 요청이 없으므로 묶음 다운로드 후 종목별 계산에 사용합니다.
+    반환 형식과 실패 처리(None 금지)는 analyze_stock과 동일합니다.
+    """
     try:
-        # 1. 데이터 가져오기 (실패 시 0점 반환, None 반환 금지)
-        client = DataClient()
-        try:
-            df = client.fetch(ticker, period)
-        except Exception as fetch_err:
-            return pd.DataFrame(), 0.0, f"🔴 데이터 수집 실패 ({str(fetch_err)[:30]})", [], 0.0
-        
         # 2. 현재가 계산
         if df.empty:
             return pd.DataFrame(), 0.0, "🔴 데이터 없음", [], 0.0
@@ -1,7 +1,8 @@
-import yfinance as yf
-import pandas as pd
+import threading
 import streamlit as st
-from stocks import STOCK_DICT
+from types import MappingProxyType
+from engine import DataClient, InsufficientDataError, analyze_stock, analyze_stock_df, analyze_stocks_batch
+from stocks import STOCK_DICT, get_all_tickers
 
 @st.cache_data(ttl=3600)
 def get_categorized_stocks():
@@ -27,4 +28,143 @@ def get_all_krx_stocks():
         all_assets.update(STOCK_DICT.get("KOSDAQ", {}))
         return all_assets
     except:
-        return {"삼성전자": "005930.KS"}
\ No newline at end of file
+        return {"삼성전자": "005930.KS"}
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def get_krx_options():
+    """국내 종목 등록 폼용 (종목명 → 티커 읽기 전용 매핑, 종목명 튜플) - 모든 세션 공유
+
+    get_all_krx_stocks(cache_data) 는 호출마다 dict 복사본을 돌려주므로, rerun 마다 다시 쓰는
+    선택지 목록은 cache_resource 로 한 번 만든 변경 불가 객체를 그대로 돌려줍니다.
+    """
+    stocks = get_all_krx_stocks()
+    return MappingProxyType(stocks), tuple(stocks)
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_ticker_catalog(market_key):
+    """시장별 전 종목 카탈로그 (FinanceDataReader, 1시간 TTL · 모든 세션 공유)
+
+    Returns:
+        (items, name_map) — items 는 (종목명, 티커) 튜플, name_map 은 티커 → 종목명 읽기 전용 매핑.
+        cache_resource 는 복사 없이 같은 객체를 돌려주므로 둘 다 변경 불가 타입으로 반환합니다.
+    """
+    items = tuple(get_all_tickers(market_key))
+    name_map = MappingProxyType({code: name for name, code in items})
+    return items, name_map
+
+class _UncachedResult(Exception):
+    """분석 실패 결과를 캐시에 남기지 않기 위한 내부 신호 (예외는 cache_data 에 저장되지 않음)"""
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+# 시장 스캔(최대 1,000종목)이 포트폴리오 종목 캐시를 밀어내지 않도록 여유 있게 상한 설정
+@st.cache_data(ttl=900, max_entries=2000, show_spinner=False)
+def _analyze_stock_cached(ticker, period, apply_fundamental):
+    result = analyze_stock(ticker, period, apply_fundamental)
+    df = result[0]
+    if df is None or df.empty:
+        # 야후 일시 장애로 빈 결과가 15분간 고정되는 것을 방지
+        raise _UncachedResult(result)
+    return result
+
+def get_cached_analysis(ticker, period="1y", apply_fundamental=False):
+    """analyze_stock 결과 캐시 (15분 TTL)
+
+    같은 종목을 다시 분석하면 야후 재다운로드 + 지표 재계산 없이 바로 반환합니다.
+    반환값에 DataFrame 이 있으므로 (복사본을 돌려주는) cache_data 를 사용하며,
+    분석 실패(빈 DataFrame)는 캐시하지 않고 다음 호출에서 다시 시도합니다.
+    """
+    try:
+        return _analyze_stock_cached(ticker, period, apply_fundamental)
+    except _UncachedResult as miss:
+        return miss.result
+
+@st.cache_data(ttl=900, show_spinner=False)
+def _analyze_batch_cached(tickers, period, apply_fundamental):
+    # 묶음에서 빠진 종목은 analyze_stocks_batch 가 이미 개별 재시도했으므로 실패 튜플도 그대로 보관
+    # (다시 시도하면 같은 종목을 두 번 받게 됨 - 일시 장애 후 최신 결과는 '새로고침'으로 캐시를 비워 받음)
+    return analyze_stocks_batch(list(tickers), period, apply_fundamental)
+
+def get_cached_analysis_batch(tickers, period="1y", apply_fundamental=False):
+    """여러 종목 analyze_stock 결과를 묶음 다운로드 1회 + 로컬 계산으로 받아 캐시 (15분 TTL)
+
+    Returns:
+        {ticker: analyze_stock 과 같은 5-튜플} — 목록 화면처럼 종목 N개를 한 번에 그릴 때 사용.
+        실패 종목은 엔진의 실패 튜플(빈 DataFrame)이 그대로 들어 있습니다.
+    """
+    # 같은 종목을 여러 번 보유(분할 매수 등)해도 분석은 종목당 1회 - 순서는 처음 나온 위치 기준
+    return _analyze_batch_cached(tuple(dict.fromkeys(tickers)), period, apply_fundamental)
+
+def clear_analysis_cache():
+    """종목 분석 캐시(단건/묶음) 비우기 - 사용자가 '새로고침'으로 최신 시세를 원할 때"""
+    _analyze_stock_cached.clear()
+    _analyze_batch_cached.clear()
+
+@st.cache_data(ttl=900, show_spinner=False)
+def get_cached_history_batch(tickers, period="1y"):
+    """여러 종목 일봉을 yf.download 묶음 요청(20종목 단위)으로 받아 캐시 (15분 TTL)
+
+    tickers 는 해시 가능한 tuple 로 넘기십시오. 묶음에서 빠진 종목은 결과 dict 에 없습니다.
+    시장 스캔은 묶음 단위로 스레드 풀에서 호출하므로 묶음 내부 병렬 요청은 끕니다 (동시 접속 수 제한).
+    """
+    return DataClient().fetch_many(list(tickers), period, threads=False)
+
+# 디스크 캐시는 ttl 이 적용되지 않아 지난 시간대 파일이 남으므로, 시간대가 바뀌면 한 번 비움
+_SCAN_BUCKET_LOCK = threading.Lock()
+_scan_bucket = None
+
+def _is_insufficient(exc):
+    """상폐/거래정지/이력 부족처럼 다시 받아도 같은 결과인 실패인지 (DataClient.fetch 가 DataFetchError 로 감싸 던짐)"""
+    return isinstance(exc, InsufficientDataError) or isinstance(exc.__context__, InsufficientDataError)
+
+@st.cache_data(persist="disk", max_entries=500, show_spinner=False)
+def _scan_chunk_cached(tickers, hour_bucket):
+    frames = get_cached_history_batch(tickers, "1y")
+    # 묶음 요청이 통째로 비었으면 야후 일시 장애/요청 제한 → 이번 결과는 디스크에 고정하지 않음
+    transient = not frames
+    client = DataClient()
+    rows, failures = [], []
+    for ticker in tickers:
+        df = frames.get(ticker)
+        if df is None:
+            # 묶음 응답에서 빠진 종목만 개별 재시도
+            try:
+                df = client.fetch(ticker, "1y")
+            except Exception as fetch_err:
+                transient = transient or not _is_insufficient(fetch_err)
+                failures.append((ticker, f"🔴 데이터 수집 실패 ({str(fetch_err)[:30]})"))
+                continue
+        df, final_score, verdict, _detail, _stop = analyze_stock_df(df, ticker, False)
+        if df is not None and not df.empty:
+            rows.append((ticker, final_score, verdict, float(df["Close"].iloc[-1])))
+        else:
+            # 데이터가 30일 미만이거나, 폭포수 계산이 불가하여 엔진이 쳐낸 경우 (같은 데이터면 결과도 같으므로 저장)
+            failures.append((ticker, verdict if verdict else "조건 미달 (데이터 부족/상폐/거래정지)"))
+    if transient:
+        raise _UncachedResult((rows, failures))
+    return rows, failures
+
+def get_cached_scan_chunk(tickers, hour_bucket):
+    """시장 스캔 20종목 묶음의 결과 행만 디스크에 보관 (앱 재시작/다른 사용자도 즉시 재사용)
+
+    persist="disk" 에서는 ttl 이 디스크 파일에 적용되지 않으므로 hour_bucket(예: "20240102_15")을 키에 넣어
+    1시간 단위로 갱신하고, 새 시간대 첫 호출에서 지난 시간대 항목을 지웁니다.
+    DataFrame 대신 숫자 튜플만 저장해 피클 크기를 작게 유지합니다. 상폐/이력 부족 같은 실패 행은 함께 저장하고,
+    네트워크 일시 오류가 섞인 묶음만 저장하지 않습니다.
+
+    Returns:
+        (rows, failures) — rows: [(ticker, score, verdict, close)], failures: [(ticker, reason)]
+    """
+    global _scan_bucket
+    with _SCAN_BUCKET_LOCK:
+        # 문자열 비교 = 시간 순 비교 ("%Y%m%d_%H") → 시간대 경계에서 늦게 시작한 스캔이 새 항목을 지우지 않음
+        if _scan_bucket is None or hour_bucket > _scan_bucket:
+            if _scan_bucket is not None:
+                _scan_chunk_cached.clear()
+            _scan_bucket = hour_bucket
+    try:
+        return _scan_chunk_cached(tickers, hour_bucket)
+    except _UncachedResult as miss:
+        return miss.result
@@ -1,15 +1,26 @@
 import json
+import mmap
 import os
+import re
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
-import fcntl
 
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson
+    _ORJSON_AVAILABLE = True
+except ImportError:
+    _ORJSON_AVAILABLE = False
+
+# 로깅 설정은 앱 진입점(web_bot.py)에서 담당
 logger = logging.getLogger(__name__)
 
 # ====== 포트폴리오 데이터 스키마 ======
@@ -67,19 +78,109 @@ def validate_stock_entry(entry: Dict) -> Tuple[bool, str]:
     
     return True, "✅ 유효한 항목"
 
-def _lock_file(f):
-    """파일 잠금 (Unix/Linux/Mac)"""
-    try:
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-    except:
-        pass  # Windows에서는 무시
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+
+def _iter_json_array(data: str):
+    """JSON 배열 문자열을 항목 단위로 하나씩 디코딩합니다.
+
+    전체 리스트를 먼저 만들지 않으므로 호출 측에서 항목을 받자마자 검증하고,
+    잘못된 항목을 만나면 나머지를 파싱하지 않고 바로 중단할 수 있습니다.
+    배열이 아니면 TypeError, JSON 문법 오류는 json.JSONDecodeError 를 발생시킵니다.
+    """
+    skip_ws = _JSON_WS.match
+    decode = _JSON_DECODER.raw_decode
+
+    idx = skip_ws(data, 0).end()
+    if data[idx:idx + 1] != "[":
+        json.loads(data)  # 깨진 JSON 이면 여기서 JSONDecodeError
+        raise TypeError("JSON 배열이 아닙니다.")
+
+    idx = skip_ws(data, idx + 1).end()
+    if data[idx:idx + 1] == "]":
+        idx += 1
+    else:
+        while True:
+            item, idx = decode(data, idx)
+            yield item
+            idx = skip_ws(data, idx).end()
+            ch = data[idx:idx + 1]
+            idx += 1
+            if ch == "]":
+                break
+            if ch != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", data, idx - 1)
+            idx = skip_ws(data, idx).end()
+
+    if skip_ws(data, idx).end() != len(data):
+        raise json.JSONDecodeError("Extra data", data, idx)
 
-def _unlock_file(f):
-    """파일 잠금 해제"""
+# 스레드별로 이미 잡고 있는 잠금 (같은 스레드의 재진입 허용)
+_LOCK_STATE = threading.local()
+
+def _lock_fd(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+def _unlock_fd(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def _with_user_lock(user_id: str):
+    """사용자별 사이드카 잠금 파일(portfolio_<uid>.json.lock)에 배타 잠금을 겁니다.
+
+    데이터 파일은 임시 파일 + rename 으로 교체되므로 데이터 파일 자체의 fd 에 거는
+    잠금은 쓰기 간 상호 배제가 되지 않습니다. load → 수정 → save 전체 구간을 이 잠금으로
+    감싸야 동시 저장 시 변경분이 유실되지 않습니다.
+    같은 스레드에서 중첩 호출하면 (예: CRUD 함수 안의 save_portfolio) 바깥 잠금을 그대로 씁니다.
+    """
+    lock_path = get_user_path(user_id) + ".lock"
+    held = getattr(_LOCK_STATE, "held", None)
+    if held is None:
+        held = _LOCK_STATE.held = {}
+
+    if lock_path in held:
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
     try:
-        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-    except:
-        pass
+        _lock_fd(fd)
+        held[lock_path] = 1
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+_MMAP_THRESHOLD = 4096  # 이보다 큰 파일은 mmap 으로 페이지 캐시에서 바로 파싱
+
+def _read_json_file(path: str):
+    """JSON 파일을 바이트 그대로 파싱합니다 (텍스트 디코딩 단계 생략).
+
+    orjson 이 있으면 큰 파일은 mmap 버퍼를 복사 없이 넘기고,
+    없으면 표준 json 으로 폴백합니다 (json.loads 도 UTF-8 바이트를 직접 받음).
+    """
+    with open(path, "rb") as f:
+        if _ORJSON_AVAILABLE:
+            if os.fstat(f.fileno()).st_size > _MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with memoryview(mm) as view:
+                        return orjson.loads(view)
+            return orjson.loads(f.read())
+        return json.loads(f.read())
 
 def load_portfolio(user_id: str) -> List[Dict]:
     """특정 사용자의 저장된 포트폴리오 데이터를 불러옵니다."""
@@ -89,28 +190,32 @@ def load_portfolio(user_id: str) -> List[Dict]:
     
     path = get_user_path(user_id)
     
-    if not os.path.exists(path):
-        logger.info(f"포트폴리오 파일이 존재하지 않습니다: {path}")
-        return []
-    
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            _lock_file(f)
-            data = json.load(f)
-            _unlock_file(f)
+        # 스냅샷과 추가 로그는 같은 잠금 안에서 함께 읽음 - save_portfolio 가 스냅샷 교체 후 로그를 지우기
+        # 전 사이에 읽으면 새 스냅샷 위에 이미 흡수된 옛 로그를 다시 재생하게 됨
+        with _with_user_lock(user_id):
+            if not os.path.exists(path):
+                if not os.path.exists(_log_path(user_id)):
+                    logger.info("포트폴리오 파일이 존재하지 않습니다: %s", path)
+                    return []
+                # 스냅샷 없이 추가 로그만 있는 경우 (첫 종목을 로그로 등록)
+                return _replay_log(user_id, [])
+            
+            data = _read_json_file(path)
             
-            # 메타데이터는 제외하고 포트폴리오만 반환
+            # 메타데이터는 제외하고 포트폴리오만 반환 (스냅샷 이후의 추가/삭제 로그를 덧붙여 재생)
             if isinstance(data, dict) and "stocks" in data:
-                logger.info(f"포트폴리오 로드 성공 ({user_id}): {len(data['stocks'])}개 종목")
-                return data["stocks"]
+                stocks = _replay_log(user_id, data["stocks"])
+                logger.info("포트폴리오 로드 성공 (%s): %d개 종목", user_id, len(stocks))
+                return stocks
             else:
-                logger.warning(f"포트폴리오 형식이 잘못되었습니다: {path}")
+                logger.warning("포트폴리오 형식이 잘못되었습니다: %s", path)
                 return []
     except json.JSONDecodeError as e:
-        logger.error(f"JSON 파싱 에러 ({user_id}): {e}")
+        logger.error("JSON 파싱 에러 (%s): %s", user_id, e)
         return []
     except Exception as e:
-        logger.error(f"데이터 로드 에러 ({user_id}): {e}")
+        logger.error("데이터 로드 에러 (%s): %s", user_id, e)
         return []
 
 def save_portfolio(user_id: str, portfolio_list: List[Dict]) -> bool:
@@ -123,56 +228,142 @@ def save_portfolio(user_id: str, portfolio_list: List[Dict]) -> bool:
     for i, entry in enumerate(portfolio_list):
         is_valid, msg = validate_stock_entry(entry)
         if not is_valid:
-            logger.error(f"포트폴리오 항목 {i}번 유효성 검사 실패: {msg}")
+            logger.error("포트폴리오 항목 %d번 유효성 검사 실패: %s", i, msg)
             return False
     
     path = get_user_path(user_id)
+    temp_path = path + ".tmp"
+    now_iso = datetime.now().isoformat()  # updated_at / created_at 공용 (1회만 생성)
     
     try:
-        # 메타데이터와 함께 저장
-        data = {
-            "metadata": {
-                "user_id": user_id,
-                "created_at": None,
-                "updated_at": datetime.now().isoformat(),
-                "stock_count": len(portfolio_list)
-            },
-            "stocks": portfolio_list
-        }
-        
-        # 기존 파일이 있으면 생성일 유지
-        if os.path.exists(path):
-            try:
-                existing = json.load(open(path, "r", encoding="utf-8"))
-                if "metadata" in existing:
-                    data["metadata"]["created_at"] = existing["metadata"].get("created_at")
-            except:
-                pass
-        
-        if not data["metadata"]["created_at"]:
-            data["metadata"]["created_at"] = datetime.now().isoformat()
-        
-        # 임시 파일에 먼저 저장 후 이동 (원자성 보장)
-        temp_path = path + ".tmp"
-        with open(temp_path, "w", encoding="utf-8") as f:
-            _lock_file(f)
-            json.dump(data, f, ensure_ascii=False, indent=4)
-            _unlock_file(f)
-        
-        # 임시 파일을 최종 파일로 이동
-        if os.path.exists(path):
-            os.remove(path)
-        os.rename(temp_path, path)
+        with _with_user_lock(user_id):
+            # 메타데이터와 함께 저장
+            data = {
+                "metadata": {
+                    "user_id": user_id,
+                    "created_at": None,
+                    "updated_at": now_iso,
+                    "stock_count": len(portfolio_list)
+                },
+                "stocks": portfolio_list
+            }
+            
+            # 기존 파일이 있으면 생성일 유지
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        existing = json.load(f)
+                    if "metadata" in existing:
+                        data["metadata"]["created_at"] = existing["metadata"].get("created_at")
+                except:
+                    pass
+            
+            if not data["metadata"]["created_at"]:
+                data["metadata"]["created_at"] = now_iso
+            
+            # 임시 파일에 먼저 저장 후 원자적으로 교체
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+            os.replace(temp_path, path)
+            # 스냅샷에 전체 목록이 들어갔으므로 이전 추가/삭제 로그는 폐기
+            _remove_log(user_id)
         
-        logger.info(f"포트폴리오 저장 성공 ({user_id}): {len(portfolio_list)}개 종목")
+        logger.info("포트폴리오 저장 성공 (%s): %d개 종목", user_id, len(portfolio_list))
         return True
     except Exception as e:
-        logger.error(f"데이터 저장 에러 ({user_id}): {e}")
+        logger.error("데이터 저장 에러 (%s): %s", user_id, e)
         # 임시 파일 정리
         if os.path.exists(temp_path):
             os.remove(temp_path)
         return False
 
+# ====== 추가 전용 변경 로그 (portfolio_<uid>.json.log) ======
+# 종목 1개 추가/삭제마다 전체 파일을 다시 쓰지 않고 JSON Lines 한 줄만 덧붙입니다.
+# 로드 시 스냅샷(portfolio_<uid>.json) 위에 로그를 순서대로 재생하고,
+# save_portfolio 로 전체 저장하면 로그는 스냅샷에 흡수되어 삭제됩니다.
+
+_LOG_COMPACT_BYTES = 64 * 1024  # 로그가 이보다 커지면 스냅샷으로 압축
+
+def _log_path(user_id: str) -> str:
+    return get_user_path(user_id) + ".log"
+
+def _remove_log(user_id: str):
+    try:
+        os.remove(_log_path(user_id))
+    except FileNotFoundError:
+        pass
+
+def _entry_key(entry: Dict) -> Tuple:
+    """삭제 표시용 종목 식별자 (티커, 매수일, 매수가) - 같은 값이면 같은 매수 건으로 봄"""
+    return (entry.get("ticker"), entry.get("buy_date"), entry.get("buy_price"))
+
+def _replay_log(user_id: str, stocks: List[Dict]) -> List[Dict]:
+    """스냅샷 목록 위에 변경 로그를 순서대로 적용합니다 (깨진 줄은 건너뜀)."""
+    try:
+        f = open(_log_path(user_id), "rb")
+    except FileNotFoundError:
+        return stocks
+    with f:
+        for line_no, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("변경 로그 %d번째 줄 손상 (%s) - 건너뜀", line_no, user_id)
+                continue
+            op = record.get("op")
+            if op == "add":
+                stocks.append(record["entry"])
+            elif op == "del":
+                if "key" in record:
+                    # 위치가 아니라 종목 식별자로 찾음 - 저장된 목록과 세션 목록의 순서가 달라도 다른 종목을 지우지 않음
+                    key = tuple(record["key"])
+                    pos = next((i for i, s in enumerate(stocks) if _entry_key(s) == key), None)
+                    if pos is not None:
+                        del stocks[pos]
+                    else:
+                        logger.warning("변경 로그 삭제 대상 없음 (%s): %s", user_id, record["key"])
+                    continue
+                # 식별자 도입 전 로그 (위치 기반)
+                index = record.get("index")
+                if isinstance(index, int) and 0 <= index < len(stocks):
+                    del stocks[index]
+                else:
+                    logger.warning("변경 로그 삭제 위치 범위 밖 (%s): %s", user_id, index)
+    return stocks
+
+def _append_log(user_id: str, record: Dict) -> bool:
+    if not user_id:
+        logger.warning("사용자 ID가 없습니다.")
+        return False
+    
+    log_path = _log_path(user_id)
+    try:
+        with _with_user_lock(user_id):
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # 로그가 길어지면 재생 비용이 커지므로 스냅샷으로 압축 (save_portfolio 가 로그 삭제)
+            if os.path.getsize(log_path) > _LOG_COMPACT_BYTES:
+                return save_portfolio(user_id, load_portfolio(user_id))
+        return True
+    except Exception as e:
+        logger.error("변경 로그 기록 에러 (%s): %s", user_id, e)
+        return False
+
+def append_portfolio_entry(user_id: str, entry: Dict) -> bool:
+    """종목 1개를 목록 끝에 추가합니다 (전체 파일 재작성 없이 로그 한 줄)."""
+    is_valid, msg = validate_stock_entry(entry)
+    if not is_valid:
+        logger.error("추가 항목 유효성 검사 실패: %s", msg)
+        return False
+    return _append_log(user_id, {"op": "add", "entry": entry})
+
+def append_portfolio_tombstone(user_id: str, entry: Dict) -> bool:
+    """목록에서 entry 와 같은 종목(티커·매수일·매수가) 1건을 삭제합니다 (삭제 표시 한 줄만 기록)."""
+    if not isinstance(entry, dict) or not entry.get("ticker"):
+        logger.error("삭제 대상 종목이 올바르지 않습니다: %s", entry)
+        return False
+    return _append_log(user_id, {"op": "del", "key": list(_entry_key(entry))})
+
 # ====== CRUD 작업 함수 ======
 
 def add_stock(user_id: str, name: str, ticker: str, quantity: float, 
@@ -194,40 +385,42 @@ def add_stock(user_id: str, name: str, ticker: str, quantity: float,
     # 유효성 검사
     is_valid, msg = validate_stock_entry(new_entry)
     if not is_valid:
-        logger.warning(f"종목 추가 실패: {msg}")
+        logger.warning("종목 추가 실패: %s", msg)
         return False, msg
     
-    # 포트폴리오 로드
-    portfolio = load_portfolio(user_id)
-    
-    # 중복 확인 (같은 티커가 이미 있으면 수량 합산)
-    for item in portfolio:
-        if item["ticker"] == ticker:
-            item["quantity"] += quantity
-            logger.info(f"기존 종목 수량 증가 ({user_id}, {ticker}): +{quantity}")
-            success = save_portfolio(user_id, portfolio)
-            return success, f"'{name}' 수량을 {quantity}개 추가했습니다." if success else "저장 실패"
-    
-    # 새 종목 추가
-    portfolio.append(new_entry)
-    success = save_portfolio(user_id, portfolio)
+    with _with_user_lock(user_id):
+        # 포트폴리오 로드
+        portfolio = load_portfolio(user_id)
+        
+        # 중복 확인 (같은 티커가 이미 있으면 수량 합산)
+        for item in portfolio:
+            if item["ticker"] == ticker:
+                item["quantity"] += quantity
+                logger.info("기존 종목 수량 증가 (%s, %s): +%s", user_id, ticker, quantity)
+                success = save_portfolio(user_id, portfolio)
+                return success, f"'{name}' 수량을 {quantity}개 추가했습니다." if success else "저장 실패"
+        
+        # 새 종목 추가
+        portfolio.append(new_entry)
+        success = save_portfolio(user_id, portfolio)
     return success, f"'{name}' 종목을 추가했습니다." if success else "저장 실패"
 
 def remove_stock(user_id: str, ticker: str) -> Tuple[bool, str]:
     """포트폴리오에서 종목을 제거합니다."""
     
-    portfolio = load_portfolio(user_id)
-    original_count = len(portfolio)
-    
-    portfolio = [item for item in portfolio if item["ticker"] != ticker]
-    
-    if len(portfolio) == original_count:
-        logger.warning(f"제거할 종목이 없습니다: {ticker}")
-        return False, f"티커 '{ticker}' 종목을 찾을 수 없습니다."
-    
-    success = save_portfolio(user_id, portfolio)
+    with _with_user_lock(user_id):
+        portfolio = load_portfolio(user_id)
+        original_count = len(portfolio)
+        
+        portfolio = [item for item in portfolio if item["ticker"] != ticker]
+        
+        if len(portfolio) == original_count:
+            logger.warning("제거할 종목이 없습니다: %s", ticker)
+            return False, f"티커 '{ticker}' 종목을 찾을 수 없습니다."
+        
+        success = save_portfolio(user_id, portfolio)
     if success:
-        logger.info(f"종목 제거 성공 ({user_id}, {ticker})")
+        logger.info("종목 제거 성공 (%s, %s)", user_id, ticker)
     
     return success, f"종목을 제거했습니다." if success else "저장 실패"
 
@@ -235,29 +428,30 @@ def update_stock(user_id: str, ticker: str, quantity: Optional[float] = None,
                  buy_price: Optional[float] = None) -> Tuple[bool, str]:
     """포트폴리오의 종목 정보를 수정합니다."""
     
-    portfolio = load_portfolio(user_id)
-    found = False
-    
-    for item in portfolio:
-        if item["ticker"] == ticker:
-            found = True
-            if quantity is not None:
-                if quantity <= 0:
-                    return False, "수량은 0보다 커야 합니다."
-                item["quantity"] = quantity
-            if buy_price is not None:
-                if buy_price < 0:
-                    return False, "매입가는 0 이상이어야 합니다."
-                item["buy_price"] = buy_price
-            break
-    
-    if not found:
-        logger.warning(f"수정할 종목이 없습니다: {ticker}")
-        return False, f"티커 '{ticker}' 종목을 찾을 수 없습니다."
-    
-    success = save_portfolio(user_id, portfolio)
+    with _with_user_lock(user_id):
+        portfolio = load_portfolio(user_id)
+        found = False
+        
+        for item in portfolio:
+            if item["ticker"] == ticker:
+                found = True
+                if quantity is not None:
+                    if quantity <= 0:
+                        return False, "수량은 0보다 커야 합니다."
+                    item["quantity"] = quantity
+                if buy_price is not None:
+                    if buy_price < 0:
+                        return False, "매입가는 0 이상이어야 합니다."
+                    item["buy_price"] = buy_price
+                break
+        
+        if not found:
+            logger.warning("수정할 종목이 없습니다: %s", ticker)
+            return False, f"티커 '{ticker}' 종목을 찾을 수 없습니다."
+        
+        success = save_portfolio(user_id, portfolio)
     if success:
-        logger.info(f"종목 수정 성공 ({user_id}, {ticker})")
+        logger.info("종목 수정 성공 (%s, %s)", user_id, ticker)
     
     return success, "종목 정보를 수정했습니다." if success else "저장 실패"
 
@@ -270,76 +464,77 @@ def get_stock(user_id: str, ticker: str) -> Optional[Dict]:
         if item["ticker"] == ticker:
             return item
     
-    logger.info(f"종목을 찾을 수 없습니다: {ticker}")
+    logger.info("종목을 찾을 수 없습니다: %s", ticker)
     return None
 
 # ====== 포트폴리오 분석 함수 ======
 
-def calculate_portfolio_stats(user_id: str, current_prices: Dict[str, float]) -> Dict:
-    """포트폴리오의 통계를 계산합니다."""
-    
-    portfolio = load_portfolio(user_id)
-    
-    if not portfolio:
-        return {
-            "total_invest": 0,
-            "current_value": 0,
-            "profit_loss": 0,
-            "profit_loss_rate": 0,
-            "stock_count": 0
-        }
+def _summarize_portfolio(portfolio: List[Dict], current_prices: Dict[str, float]) -> Tuple[Dict, List[Dict]]:
+    """포트폴리오를 한 번만 순회하며 통계와 비중을 함께 계산합니다."""
     
     total_invest = 0  # 총 매입 금액
     current_value = 0  # 현재 평가 금액
+    composition = []
     
+    get_price = current_prices.get
     for item in portfolio:
-        invest = item["quantity"] * item["buy_price"]
+        quantity = item["quantity"]
+        buy_price = item["buy_price"]
+        current_price = get_price(item["ticker"], buy_price)
+        invest = quantity * buy_price
+        value = quantity * current_price
         total_invest += invest
+        current_value += value
         
-        current_price = current_prices.get(item["ticker"], item["buy_price"])
-        current = item["quantity"] * current_price
-        current_value += current
+        composition.append({
+            "name": item["name"],
+            "ticker": item["ticker"],
+            "quantity": quantity,
+            "buy_price": buy_price,
+            "current_price": current_price,
+            "current_value": value,
+            "ratio": 0,
+            "profit_loss": value - invest
+        })
+    
+    # 비중은 총액이 확정된 뒤에만 계산 가능
+    if current_value > 0:
+        for row in composition:
+            row["ratio"] = row["current_value"] / current_value * 100
+    composition.sort(key=lambda x: x["current_value"], reverse=True)
     
     profit_loss = current_value - total_invest
     profit_loss_rate = (profit_loss / total_invest * 100) if total_invest > 0 else 0
     
-    return {
+    stats = {
         "total_invest": total_invest,
         "current_value": current_value,
         "profit_loss": profit_loss,
         "profit_loss_rate": profit_loss_rate,
         "stock_count": len(portfolio)
     }
+    return stats, composition
 
-def get_portfolio_composition(user_id: str, current_prices: Dict[str, float]) -> List[Dict]:
-    """포트폴리오의 비중을 계산합니다."""
-    
-    portfolio = load_portfolio(user_id)
-    composition = []
+def analyze_portfolio(user_id: str, current_prices: Dict[str, float]) -> Tuple[Dict, List[Dict]]:
+    """포트폴리오 통계와 비중을 한 번에 계산합니다.
+
+    calculate_portfolio_stats() + get_portfolio_composition() 를 연달아 부르면
+    파일을 두 번 읽고 두 번 순회하므로, 둘 다 필요하면 이 함수를 사용하세요.
+    """
     
-    total_value = 0
-    for item in portfolio:
-        current_price = current_prices.get(item["ticker"], item["buy_price"])
-        value = item["quantity"] * current_price
-        total_value += value
+    return _summarize_portfolio(load_portfolio(user_id), current_prices)
+
+def calculate_portfolio_stats(user_id: str, current_prices: Dict[str, float]) -> Dict:
+    """포트폴리오의 통계를 계산합니다."""
     
-    for item in portfolio:
-        current_price = current_prices.get(item["ticker"], item["buy_price"])
-        value = item["quantity"] * current_price
-        ratio = (value / total_value * 100) if total_value > 0 else 0
-        
-        composition.append({
-            "name": item["name"],
-            "ticker": item["ticker"],
-            "quantity": item["quantity"],
-            "buy_price": item["buy_price"],
-            "current_price": current_price,
-            "current_value": value,
-            "ratio": ratio,
-            "profit_loss": value - (item["quantity"] * item["buy_price"])
-        })
+    stats, _ = analyze_portfolio(user_id, current_prices)
+    return stats
+
+def get_portfolio_composition(user_id: str, current_prices: Dict[str, float]) -> List[Dict]:
+    """포트폴리오의 비중을 계산합니다."""
     
-    return sorted(composition, key=lambda x: x["current_value"], reverse=True)
+    _, composition = analyze_portfolio(user_id, current_prices)
+    return composition
 
 # ====== 포트폴리오 관리 함수 ======
 
@@ -349,7 +544,7 @@ def clear_portfolio(user_id: str) -> Tuple[bool, str]:
     success = save_portfolio(user_id, [])
     
     if success:
-        logger.info(f"포트폴리오 초기화 ({user_id})")
+        logger.info("포트폴리오 초기화 (%s)", user_id)
     
     return success, "포트폴리오를 초기화했습니다." if success else "초기화 실패"
 
@@ -359,44 +554,57 @@ def delete_portfolio(user_id: str) -> Tuple[bool, str]:
     path = get_user_path(user_id)
     
     try:
-        if os.path.exists(path):
-            os.remove(path)
-            logger.info(f"포트폴리오 파일 삭제 ({user_id}): {path}")
-            return True, "포트폴리오 파일을 삭제했습니다."
-        else:
-            return False, "포트폴리오 파일이 존재하지 않습니다."
+        with _with_user_lock(user_id):
+            if not os.path.exists(path) and not os.path.exists(_log_path(user_id)):
+                return False, "포트폴리오 파일이 존재하지 않습니다."
+            if os.path.exists(path):
+                os.remove(path)
+            _remove_log(user_id)
+        logger.info("포트폴리오 파일 삭제 (%s): %s", user_id, path)
+        return True, "포트폴리오 파일을 삭제했습니다."
     except Exception as e:
-        logger.error(f"포트폴리오 파일 삭제 실패 ({user_id}): {e}")
+        logger.error("포트폴리오 파일 삭제 실패 (%s): %s", user_id, e)
         return False, f"삭제 실패: {str(e)}"
 
+_CSV_NEEDS_QUOTE = re.compile(r'[,"\r\n]')
+
+def _csv_esc(value) -> str:
+    """CSV 필드 하나를 문자열로 변환합니다 (구분자/따옴표/개행이 있을 때만 따옴표 처리)."""
+    if value is None:
+        return ""
+    text = value if isinstance(value, str) else str(value)
+    if _CSV_NEEDS_QUOTE.search(text):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
 def export_portfolio(user_id: str, format: str = "json") -> Optional[str]:
     """포트폴리오를 내보냅니다."""
     
     portfolio = load_portfolio(user_id)
     
     if not portfolio:
-        logger.warning(f"내보낼 포트폴리오가 없습니다 ({user_id})")
+        logger.warning("내보낼 포트폴리오가 없습니다 (%s)", user_id)
         return None
     
     try:
         if format == "json":
             return json.dumps(portfolio, ensure_ascii=False, indent=4)
         elif format == "csv":
-            import csv
-            from io import StringIO
-            
-            output = StringIO()
-            if portfolio:
-                writer = csv.DictWriter(output, fieldnames=portfolio[0].keys())
-                writer.writeheader()
-                writer.writerows(portfolio)
-            
-            return output.getvalue()
+            # csv.DictWriter 와 같은 출력(\r\n 줄바꿈)을 행당 join 한 번으로 생성
+            # 헤더 = 전체 항목 키의 합집합(처음 나온 순서) → 국내 항목이 먼저 와도 해외 항목의 currency 등이 빠지지 않음
+            fieldnames = list(dict.fromkeys(key for item in portfolio for key in item))
+            lines = [",".join(map(_csv_esc, fieldnames))]
+            lines.extend(
+                ",".join([_csv_esc(item.get(key)) for key in fieldnames])
+                for item in portfolio
+            )
+            lines.append("")
+            return "\r\n".join(lines)
         else:
-            logger.warning(f"지원하지 않는 형식: {format}")
+            logger.warning("지원하지 않는 형식: %s", format)
             return None
     except Exception as e:
-        logger.error(f"포트폴리오 내보내기 실패: {e}")
+        logger.error("포트폴리오 내보내기 실패: %s", e)
         return None
 
 def import_portfolio(user_id: str, data: str, format: str = "json") -> Tuple[bool, str]:
@@ -404,29 +612,31 @@ def import_portfolio(user_id: str, data: str, format: str = "json") -> Tuple[boo
     
     try:
         if format == "json":
-            portfolio = json.loads(data)
+            items = _iter_json_array(data)
         else:
-            logger.warning(f"지원하지 않는 형식: {format}")
+            logger.warning("지원하지 않는 형식: %s", format)
             return False, f"지원하지 않는 형식입니다: {format}"
         
-        if not isinstance(portfolio, list):
-            return False, "유효한 포트폴리오 형식이 아닙니다."
-        
-        # 각 항목 검증
-        for i, item in enumerate(portfolio):
+        # 파싱과 동시에 항목 검증 (첫 오류에서 즉시 중단)
+        portfolio = []
+        portfolio_append = portfolio.append
+        for i, item in enumerate(items):
             is_valid, msg = validate_stock_entry(item)
             if not is_valid:
                 return False, f"항목 {i}: {msg}"
+            portfolio_append(item)
         
         success = save_portfolio(user_id, portfolio)
         
         if success:
-            logger.info(f"포트폴리오 가져오기 성공 ({user_id}): {len(portfolio)}개 종목")
+            logger.info("포트폴리오 가져오기 성공 (%s): %d개 종목", user_id, len(portfolio))
         
         return success, "포트폴리오를 가져왔습니다." if success else "가져오기 실패"
     except json.JSONDecodeError:
         logger.error("JSON 형식이 유효하지 않습니다.")
         return False, "유효한 JSON 형식이 아닙니다."
+    except TypeError:
+        return False, "유효한 포트폴리오 형식이 아닙니다."
     except Exception as e:
-        logger.error(f"포트폴리오 가져오기 실패: {e}")
-        return False, f"가져오기 실패: {str(e)}"
\ No newline at end of file
+        logger.error("포트폴리오 가져오기 실패: %s", e)
+        return False, f"가져오기 실패: {str(e)}"
@@ -2,6 +2,7 @@
 # yfinance 티커 기준. 잘못된 티커는 전수조사/검색 오류 원인이 됨.
 
 import logging as _logging
+from types import MappingProxyType
 
 _log = _logging.getLogger(__name__)
 
@@ -25,11 +26,11 @@ def get_all_tickers(market_type: str) -> list:
 
         if market_type == "KOSPI":
             df = fdr.StockListing("KOSPI")
-            return [(row["Name"], f"{row['Code']}.KS") for _, row in df.iterrows()]
+            return [(name, f"{code}.KS") for name, code in zip(df["Name"], df["Code"])]
 
         elif market_type == "KOSDAQ":
             df = fdr.StockListing("KOSDAQ")
-            return [(row["Name"], f"{row['Code']}.KQ") for _, row in df.iterrows()]
+            return [(name, f"{code}.KQ") for name, code in zip(df["Name"], df["Code"])]
 
         elif market_type == "GLOBAL":
             # S&P500 + 나스닥 상위 200 (대표성 있는 글로벌 타겟)
@@ -37,9 +38,12 @@ def get_all_tickers(market_type: str) -> list:
             nasdaq = fdr.StockListing("NASDAQ").head(200)
             pairs = []
             for _df in (sp500, nasdaq):
-                for _, row in _df.iterrows():
-                    sym = row.get("Symbol") or row.get("Code", "")
-                    name = row.get("Name", sym)
+                # iterrows(행마다 Series 생성) 대신 컬럼 배열을 zip 으로 순회
+                sym_col = "Symbol" if "Symbol" in _df.columns else "Code"
+                if sym_col not in _df.columns:
+                    continue
+                names = _df["Name"] if "Name" in _df.columns else _df[sym_col]
+                for sym, name in zip(_df[sym_col], names):
                     if sym:
                         pairs.append((name, sym))
             # 중복 제거 (티커 기준)
@@ -61,9 +65,8 @@ def get_all_tickers(market_type: str) -> list:
     except Exception as exc:
         _log.warning("get_all_tickers(%s) 실패: %s — 수동 리스트로 폴백", market_type, exc)
 
-    # 폴백: 수동 리스트에서 (이름, 티커) 페어 추출
-    fallback = STOCK_DICT.get(market_type, {})
-    return list(fallback.items()) if fallback else []
+    # 폴백: 수동 리스트의 시장별 (이름, 티커) 페어 (모듈 로드 시 미리 구성)
+    return list(MARKET_FALLBACK_PAIRS.get(market_type, ()))
 
 
 STOCK_DICT = {
@@ -149,3 +152,24 @@ STOCK_DICT = {
         "스택스": "STX4847-USD", "시바이누": "SHIB-USD", "세이": "SEI-USD",
     }
 }
+
+
+# ─────────────────────────────────────────────
+# [시장별 버킷] 수동 리스트를 시장 키 → (종목명, 티커) 튜플로 1회 분류 (FDR 장애 시 폴백용)
+# ─────────────────────────────────────────────
+MARKET_FALLBACK_PAIRS = MappingProxyType({
+    market: tuple(stocks.items()) for market, stocks in STOCK_DICT.items()
+})
+
+
+# ─────────────────────────────────────────────
+# [역방향 매핑] 코드 → 종목명 (모듈 로드 시 1회 구성, 읽기 전용으로 탭 간 공유)
+# ─────────────────────────────────────────────
+TICKER_TO_NAME_MAP = MappingProxyType({
+    code: name for stocks in STOCK_DICT.values() for name, code in stocks.items()
+})
+
+
+def get_name_from_ticker(ticker_code: str) -> str:
+    """티커(코드)를 입력하면 종목명을 반환, 없으면 코드 그대로 반환"""
+    return TICKER_TO_NAME_MAP.get(ticker_code, ticker_code)
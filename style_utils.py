@@ -1,8 +1,9 @@
+import re
+
 import streamlit as st
 
-def apply_global_style():
-    """Deep Black 배경에 최적화된 전체 UI 스타일 - 대조비 WCAG 표준 준수"""
-    st.markdown("""
+# 전역 스타일시트 원본 (섹션별 주석 포함 - 편집은 여기서)
+_RAW_STYLE = """
         <style>
         /* ============================================
            1. 전역 배경 및 기본 텍스트
@@ -337,4 +338,17 @@ def apply_global_style():
             color: #ffffff !important;
         }
         </style>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+"""
+
+# 모듈 임포트 시 1회만 주석 제거 + 공백 압축 → 매 rerun 마다 웹소켓으로 나가는 바이트 절반 이하로
+_STYLE_HTML = re.sub(r'\s+', ' ', re.sub(r'/\*.*?\*/', '', _RAW_STYLE, flags=re.S)).strip()
+
+
+def apply_global_style():
+    """Deep Black 배경에 최적화된 전체 UI 스타일 - 대조비 WCAG 표준 준수
+
+    Streamlit 은 rerun 마다 다시 출력되지 않은 요소를 지우므로 CSS 는 매번 내보내야 한다.
+    대신 미리 압축해 둔 상수 문자열만 전송한다.
+    web_bot.main() 에서 rerun 당 1회만 호출 - 각 탭/팝업(st.dialog)은 같은 페이지 CSS 를 그대로 물려받는다.
+    """
+    st.markdown(_STYLE_HTML, unsafe_allow_html=True)
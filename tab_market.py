@@ -1,79 +1,129 @@
 import streamlit as st
 import pandas as pd
 import concurrent.futures
-from engine import analyze_stock
-from stocks import STOCK_DICT, get_all_tickers
-from style_utils import apply_global_style
+import heapq
+import time
+from operator import itemgetter
+from engine import DataClient
+from market_data import get_cached_scan_chunk, get_ticker_catalog
+from stocks import TICKER_TO_NAME_MAP, get_name_from_ticker
 
 
-# ─────────────────────────────────────────────
-# [역방향 매핑] 코드 → 종목명 변환 유틸리티 (검색 속도 최적화)
-# ─────────────────────────────────────────────
-TICKER_TO_NAME_MAP = {}
-for mkt, stocks in STOCK_DICT.items():
-    for name, code in stocks.items():
-        TICKER_TO_NAME_MAP[code] = name
-
-def get_name_from_ticker(ticker_code):
-    """티커(코드)를 입력하면 종목명을 반환, 없으면 코드 그대로 반환"""
-    return TICKER_TO_NAME_MAP.get(ticker_code, ticker_code)
+# 라디오 선택지 → 시장 키 (클릭마다 문자열 포함 검사로 판별하던 분기 대체)
+MARKET_KEY_BY_CHOICE = {
+    "🇰🇷 KOSPI": "KOSPI",
+    "🇰🇷 KOSDAQ": "KOSDAQ",
+    "🌎 GLOBAL": "GLOBAL",
+    "🔥 전체 통합 스캔 (ALL)": "ALL",
+}
 
 
 # ─────────────────────────────────────────────
 # 🚨 [1] 스캐너 엔진 (데스노트 실패 로그 추적 포함)
 # ─────────────────────────────────────────────
-def scan_multiple_stocks(ticker_list):
+# 🚨 야후 밴(Ban) 방지를 위해 워커 수는 절대 15를 넘기지 마십시오.
+MAX_SCAN_WORKERS = 15
+
+# 스캔 중 미리보기에 보여줄 상위 종목 수 / 진행바·미리보기 최소 갱신 간격(초)
+PREVIEW_ROWS = 20
+UI_UPDATE_INTERVAL = 0.2
+# 시장별 스캔 결과를 세션에 보관하는 시간(초) - 탭을 오가도 이 시간 안에는 재스캔 없이 그대로 표시
+SCAN_MEMO_TTL = 600
+
+# 결과 행은 가공 안 한 숫자 튜플로 모으고, 표시 형식은 Streamlit(Arrow) 쪽 column_config 에 맡김
+RESULT_COLUMNS = ("ticker", "score", "verdict", "close")
+# 점수는 소수 1자리라 float32 로 충분, 가격은 원/달러/코인 단위가 섞이므로 float64 유지
+RESULT_DTYPES = {"score": "float32", "close": "float64"}
+RESULT_COLUMN_CONFIG = {
+    "score": st.column_config.NumberColumn("score", format="%.1f점"),
+    "close": st.column_config.NumberColumn("close", format="localized"),
+}
+
+
+def _results_frame(rows):
+    """결과 튜플 리스트 → 컬럼/dtype 을 지정한 DataFrame (dict 목록 추론 없이 바로 구성)"""
+    return pd.DataFrame.from_records(rows, columns=RESULT_COLUMNS).astype(RESULT_DTYPES)
+
+
+def scan_multiple_stocks(ticker_list, max_workers=MAX_SCAN_WORKERS, stop_after=None, min_score=0):
     """
     [The Closer's 1,000연발 융단 폭격 스캐너 + 데스노트(실패 로그)]
+    max_workers: 동시 요청 스레드 수 (MAX_SCAN_WORKERS 로 상한 고정)
+    stop_after: 빠른 모드 - min_score 이상 종목이 이 개수만큼 잡히면 남은 작업을 취소하고 조기 종료
+                (None 이면 기존처럼 전 종목 스캔)
     """
     results = []
     failed_logs = []  # 🚨 엔진이 가차 없이 쳐낸 종목들을 기록하는 블랙박스
+    hits = 0  # min_score 이상으로 잡힌 종목 수 (빠른 모드 종료 조건)
 
-    progress_text = "🚀 다중 스레드 레이더 가동 중... (야후 서버 타격 중)"
-    my_bar = st.progress(0, text=progress_text)
     total = len(ticker_list)
     completed = 0
+    last_ui = 0.0  # 마지막 UI 갱신 시각 (time.monotonic)
 
-    # 🚨 야후 밴(Ban) 방지를 위해 워커 수는 절대 15를 넘기지 마십시오.
-    with concurrent.futures.ThreadPoolExecutor(max_workers=15) as executor:
-        future_to_ticker = {
-            executor.submit(analyze_stock, ticker, "1y", False): ticker
-            for ticker in ticker_list
-        }
+    with st.status(f"📡 {total}개 종목 묶음 수신 + 지표 계산 중... (20종목 단위)", expanded=True) as status:
+        my_bar = st.progress(0, text="📡 일봉 수신 대기 중...")
+        preview = st.empty()  # 완료 순서대로 들어오는 상위 종목 미리보기
 
-        for future in concurrent.futures.as_completed(future_to_ticker):
-            ticker = future_to_ticker[future]
-            completed += 1
+        # 종목당 1회 왕복 대신 20종목 묶음을 한 작업으로 → HTTP 요청 수 1/20, 진행바도 묶음 단위 갱신
+        size = DataClient.BATCH_SIZE
+        chunks = [tuple(ticker_list[i:i + size]) for i in range(0, total, size)]
+        max_workers = max(1, min(int(max_workers), MAX_SCAN_WORKERS))
+        # 묶음 결과 행은 1시간 단위로 디스크 캐시 → 같은 시간대 재스캔/앱 재시작 시 야후 요청 없음
+        hour_bucket = time.strftime("%Y%m%d_%H")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_chunk = {
+                executor.submit(get_cached_scan_chunk, chunk, hour_bucket): chunk for chunk in chunks
+            }
 
-            progress_percent = int((completed / total) * 100)
-            my_bar.progress(
-                progress_percent,
-                text=f"🚀 타격 진행 중... ({completed}/{total}) - 융단 폭격 중",
-            )
+            for future in concurrent.futures.as_completed(future_to_chunk):
+                chunk = future_to_chunk[future]
+                completed += len(chunk)
+
+                try:
+                    rows, failures = future.result()
+                except Exception as exc:
+                    # 묶음 전체가 실패한 경우 (네트워크 단절 등)
+                    rows = []
+                    failures = [(ticker, f"서버 타임아웃/수신 거부 ({exc})") for ticker in chunk]
+
+                # 엔진이 정상적으로 차트를 분석하고 살려둔 종목
+                results.extend(rows)
+                hits += sum(1 for row in rows if row[1] is not None and row[1] >= min_score)
+                failed_logs.extend({"ticker": ticker, "reason": reason} for ticker, reason in failures)
+
+                # UI 갱신은 UI_UPDATE_INTERVAL 초에 한 번만 (캐시 적중으로 묶음이 몰려 끝나도 웹소켓 메시지 폭주 방지)
+                now = time.monotonic()
+                if now - last_ui >= UI_UPDATE_INTERVAL or completed == total:
+                    last_ui = now
+                    chunk_label = get_name_from_ticker(chunk[0]) + (f" 외 {len(chunk) - 1}개" if len(chunk) > 1 else "")
+                    my_bar.progress(
+                        int((completed / total) * 100),
+                        text=f"🚀 타격 진행 중... ({completed}/{total}) - {chunk_label} 수신 완료",
+                    )
+                    # 중간 결과 미리보기: 점수 상위 PREVIEW_ROWS 개만 다시 그림
+                    if results:
+                        # 전체 정렬(N log N) 대신 힙으로 상위 K개만 (N log K)
+                        top = heapq.nlargest(PREVIEW_ROWS, results, key=itemgetter(1))
+                        preview.dataframe(
+                            _results_frame(top),
+                            column_config=RESULT_COLUMN_CONFIG,
+                            use_container_width=True,
+                            hide_index=True,
+                        )
+
+                # ⚡ 빠른 모드: 목표 개수를 채우면 아직 시작 안 한 묶음은 취소 (실행 중인 것만 마저 끝남)
+                if stop_after and hits >= stop_after:
+                    for f in future_to_chunk:
+                        f.cancel()
+                    break
 
-            try:
-                df, final_score, verdict, detail_info, stop_loss = future.result()
-                # 엔진이 정상적으로 차트를 분석하고 살려둔 경우
-                if df is not None and not df.empty:
-                    results.append({
-                        "ticker": ticker,
-                        "score": final_score,
-                        "verdict": verdict,
-                        "close": df["Close"].iloc[-1],
-                    })
-                else:
-                    # 데이터가 30일 미만이거나, 폭포수 계산이 불가하여 엔진이 쳐낸 경우
-                    failed_logs.append({
-                        "ticker": ticker,
-                        "reason": verdict if verdict else "조건 미달 (데이터 부족/상폐/거래정지)",
-                    })
-            except Exception as exc:
-                failed_logs.append({
-                    "ticker": ticker,
-                    "reason": f"서버 타임아웃/수신 거부 ({exc})",
-                })
-
-    my_bar.empty()
+        my_bar.empty()
+        preview.empty()
+        status.update(
+            label=f"✅ 스캔 완료 ({completed}/{total}) - 성공 {len(results)}개 / 폐기 {len(failed_logs)}개",
+            state="complete",
+            expanded=False,
+        )
     return results, failed_logs
 
 
@@ -81,7 +131,6 @@ def scan_multiple_stocks(ticker_list):
 # 🚨 [2] 시장 전수조사 UI (3대 시장 통합 + 1,000개 리미트 해제)
 # ─────────────────────────────────────────────
 def run_market_tab(unused_stock_dict):
-    apply_global_style()
     st.markdown(
         "<h1 style='color:white;'>🔥 시장 전수조사 (1,000연발 융단 폭격 모드)</h1>",
         unsafe_allow_html=True,
@@ -95,7 +144,7 @@ def run_market_tab(unused_stock_dict):
     # 코스피, 코스닥, 글로벌, 그리고 '전체' 옵션 추가
     market_choice = st.radio(
         "시장 타겟",
-        ["🇰🇷 KOSPI", "🇰🇷 KOSDAQ", "🌎 GLOBAL", "🔥 전체 통합 스캔 (ALL)"],
+        tuple(MARKET_KEY_BY_CHOICE),
         horizontal=True,
         label_visibility="collapsed",        key="market_scan_radio"    )
 
@@ -112,8 +161,44 @@ def run_market_tab(unused_stock_dict):
         key="market_scan_limit"
     )
 
+    # 동시 요청 스레드 수 (야후 응답이 불안정하면 낮춰서 스로틀링)
+    scan_workers = st.slider(
+        "⚙️ 동시 요청 스레드 수",
+        min_value=1,
+        max_value=MAX_SCAN_WORKERS,
+        value=MAX_SCAN_WORKERS,
+        help="야후 서버가 요청을 거부(타임아웃)하면 값을 낮추십시오. 밴 방지를 위해 15개가 상한입니다.",
+        key="market_scan_workers"
+    )
+
+    # ⚡ 빠른 모드: 상위 K개만 필요할 때 나머지 종목 분석을 건너뜀
+    fast_mode = st.checkbox(
+        "⚡ 빠른 모드 (상위 K개 발견 시 조기 종료)",
+        value=False,
+        help="기준 점수 이상 종목이 목표 개수만큼 잡히면 스캔을 멈춥니다. 전체 순위가 아닌 '먼저 잡힌' 종목 기준입니다.",
+        key="market_fast_mode"
+    )
+    stop_after = None
+    fast_min_score = 0
+    if fast_mode:
+        fc1, fc2 = st.columns(2)
+        with fc1:
+            stop_after = st.number_input(
+                "🎯 목표 종목 수 (K)", min_value=1, max_value=100, value=5, step=1,
+                key="market_fast_k"
+            )
+        with fc2:
+            fast_min_score = st.slider(
+                "🔥 기준 점수", min_value=0, max_value=100, value=70, step=5,
+                key="market_fast_min_score"
+            )
+
     st.markdown("---")
 
+    # ── 시장 키 결정 ──
+    market_key = MARKET_KEY_BY_CHOICE[market_choice]
+    memo_key = f"market_scan_{market_key}"
+
     # 🚨 실행 버튼
     if st.button(
         f"🚀 {market_choice} ({scan_limit}개) 융단 폭격 시작",
@@ -121,68 +206,102 @@ def run_market_tab(unused_stock_dict):
         use_container_width=True,
         key="market_scan_btn"
     ):
-        # ── 시장 키 결정 ──
-        if "ALL" in market_choice or "전체" in market_choice:
-            market_key = "ALL"
-        elif "KOSPI" in market_choice:
-            market_key = "KOSPI"
-        elif "KOSDAQ" in market_choice:
-            market_key = "KOSDAQ"
-        else:
-            market_key = "GLOBAL"
-
-        # ── 종목 리스트 구성 (FinanceDataReader 실시간) ──
+        # ── 종목 리스트 구성 (FinanceDataReader, 시장별 1시간 캐시) ──
+        # 🚨 FDR 종목명 매핑도 함께 캐시 (STOCK_DICT에 없는 종목 대응)
         with st.spinner("🎯 시장 데이터베이스 동기화 중..."):
-            raw_items = get_all_tickers(market_key)
+            raw_items, fdr_name_map = get_ticker_catalog(market_key)
             st.info(f"📋 FinanceDataReader에서 {len(raw_items)}개 종목을 확보했습니다.")
 
         # 티커만 추출 + 리미트 적용
         items = raw_items[:scan_limit]
         ticker_list = [code for _name, code in items]
 
-        # 🚨 FDR에서 가져온 종목명으로 동적 매핑 생성 (STOCK_DICT에 없는 종목 대응)
-        fdr_name_map = {code: name for name, code in items}
-
         # ── 엔진 가동 ──
-        results, failed_logs = scan_multiple_stocks(ticker_list)
-
-        # ── 결과 요약 ──
-        st.success(
-            f"✅ 총 {len(ticker_list)}발 발사 ➡️ {len(results)}개 종목 타격 성공! "
-            f"(폐기됨: {len(failed_logs)}개)"
+        results, failed_logs = scan_multiple_stocks(
+            ticker_list,
+            max_workers=scan_workers,
+            stop_after=stop_after,
+            min_score=fast_min_score,
         )
 
-        # 🚨 [신규] 실패한 쓰레기 데이터들의 데스노트 출력 (아코디언 형태)
-        if failed_logs:
-            with st.expander(
-                f"⚠️ 쳐내진 종목 / 스캔 실패 명단 ({len(failed_logs)}개) - 클릭하여 펼치기"
-            ):
-                st.markdown(
-                    "엔진이 아래의 사유로 방아쇠를 당기지 않고 즉각 폐기 처분한 종목들입니다."
-                )
-                for log in failed_logs:
-                    # FDR 매핑 우선, 없으면 STOCK_DICT 매핑, 그래도 없으면 코드 그대로
-                    name = fdr_name_map.get(log['ticker'], get_name_from_ticker(log['ticker']))
-                    st.markdown(f"- 🔴 **{name}** (`{log['ticker']}`): {log['reason']}")
-
-        # ── 성공한 결과 데이터프레임 출력 ──
+        # 스캔 결과는 시장별로 세션에 보관 → 아래 필터(기준 점수/표시 개수)를 바꿔도 야후 재요청 없이 마스크만 다시 적용
+        df_all = _results_frame(results)
+        # 🚨 종목명 컬럼 추가 (FDR 매핑 우선, STOCK_DICT 폴백, 둘 다 없으면 코드 그대로)
+        # 합친 dict 로 Series.map 1회 → 행마다 Python 조회 없이 해시 조회
+        name_map = {**TICKER_TO_NAME_MAP, **fdr_name_map}
+        df_all.insert(0, '종목명', df_all['ticker'].map(name_map).fillna(df_all['ticker']))
+        st.session_state[memo_key] = {
+            "ts": time.time(),
+            "market": market_choice,
+            "total": len(ticker_list),
+            "results": df_all,
+            "failed_logs": failed_logs,
+            "names": fdr_name_map,
+        }
         if results:
-            df_res = (
-                pd.DataFrame(results)
-                .sort_values(by="score", ascending=False)
-                .reset_index(drop=True)
-            )
-            # 🚨 종목명 컬럼 추가 (FDR 매핑 우선, STOCK_DICT 폴백)
-            df_res['종목명'] = df_res['ticker'].apply(
-                lambda t: fdr_name_map.get(t, get_name_from_ticker(t))
-            )
-            cols = ['종목명', 'ticker', 'score', 'verdict', 'close']
-            df_res = df_res[[c for c in cols if c in df_res.columns]]
-            st.dataframe(df_res, use_container_width=True)
             st.balloons()
-        else:
-            st.error(
-                "조건을 만족하는 종목이 단 하나도 없습니다. "
-                "시장이 완전한 하락장이거나 서버가 응답하지 않습니다."
+
+    # 선택한 시장의 최근 스캔 결과 (SCAN_MEMO_TTL 이 지났으면 버리고 새 스캔을 기다림)
+    scan = st.session_state.get(memo_key)
+    if scan and time.time() - scan["ts"] >= SCAN_MEMO_TTL:
+        del st.session_state[memo_key]
+        scan = None
+    if scan:
+        _render_scan_results(scan)
+
+
+def _render_scan_results(scan):
+    """세션에 보관된 스캔 결과 출력 (필터 위젯 조작은 이 부분만 다시 계산)"""
+    df_all = scan["results"]
+    failed_logs = scan["failed_logs"]
+    fdr_name_map = scan["names"]
+
+    # ── 결과 요약 ──
+    st.success(
+        f"✅ [{scan['market']}] 총 {scan['total']}발 발사 ➡️ {len(df_all)}개 종목 타격 성공! "
+        f"(폐기됨: {len(failed_logs)}개)"
+    )
+
+    # 🚨 [신규] 실패한 쓰레기 데이터들의 데스노트 출력 (아코디언 형태)
+    if failed_logs:
+        with st.expander(
+            f"⚠️ 쳐내진 종목 / 스캔 실패 명단 ({len(failed_logs)}개) - 클릭하여 펼치기"
+        ):
+            st.markdown(
+                "엔진이 아래의 사유로 방아쇠를 당기지 않고 즉각 폐기 처분한 종목들입니다."
             )
+            # 종목마다 st.markdown 을 부르면 수백 개의 요소가 전송되므로 한 덩어리 문자열로 1회 출력
+            # (FDR 매핑 우선, 없으면 STOCK_DICT 매핑, 그래도 없으면 코드 그대로)
+            st.markdown("\n".join(
+                f"- 🔴 **{fdr_name_map.get(log['ticker'], get_name_from_ticker(log['ticker']))}** "
+                f"(`{log['ticker']}`): {log['reason']}"
+                for log in failed_logs
+            ))
+
+    # ── 성공한 결과 데이터프레임 출력 ──
+    if df_all.empty:
+        st.error(
+            "조건을 만족하는 종목이 단 하나도 없습니다. "
+            "시장이 완전한 하락장이거나 서버가 응답하지 않습니다."
+        )
+        return
 
+    fc1, fc2 = st.columns(2)
+    with fc1:
+        min_score = st.slider(
+            "🔥 최소 점수", min_value=0, max_value=100, value=0, step=5, key="market_min_score"
+        )
+    with fc2:
+        max_results = st.number_input(
+            "📋 표시 개수", min_value=1, max_value=1000, value=1000, step=10,
+            key="market_max_results"
+        )
+
+    # 불리언 마스크 1회 + 힙 기반 상위 K개 (전체 정렬 없음)
+    df_view = (
+        df_all[df_all['score'] >= min_score]
+        .nlargest(int(max_results), 'score')
+        .reset_index(drop=True)
+    )
+    st.caption(f"조건 충족 {len(df_view)}개 / 전체 {len(df_all)}개")
+    st.dataframe(df_view, column_config=RESULT_COLUMN_CONFIG, use_container_width=True)
@@ -1,42 +1,85 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
-from portfolio_manager import load_portfolio, save_portfolio
-from engine import analyze_stock 
-from market_data import get_all_krx_stocks  # [수술] 전 종목 엔진 로드
-from style_utils import apply_global_style
+from plotly.subplots import make_subplots
+from portfolio_manager import append_portfolio_entry, append_portfolio_tombstone, load_portfolio
+from market_data import (  # [수술] 전 종목 엔진 로드
+    clear_analysis_cache, get_cached_analysis, get_cached_analysis_batch, get_krx_options,
+)
 import yfinance as yf
 from datetime import datetime
 
+# 보유 종목이 이 개수를 넘으면 종목별 카드(컨테이너+컬럼+버튼) 대신 표 1개로 출력
+TABLE_MODE_THRESHOLD = 15
+
+def _queue_deletes(user_id, indices):
+    """세션 목록 인덱스들을 삭제 대기열에 올리고, 파일에는 삭제 표시(tombstone)만 기록
+
+    세션 목록은 다음 전체 실행(_apply_pending_deletes)까지 그대로라 인덱스가 유지됩니다.
+    삭제 표시에는 위치 대신 종목 식별자(티커·매수일·매수가)를 남기므로 파일 쪽 목록 순서와 무관합니다.
+    로그 한 줄이라 기록 결과를 기다렸다가 성공한 것만 대기열에 올림 - 실패한 행은 숨기지 않고 오류를 표시.
+
+    Returns:
+        모두 기록되었으면 True
+    """
+    pending = st.session_state.pf_pending_deletes
+    stocks = st.session_state.my_stocks
+    ok = True
+    for i in sorted(set(indices) - pending):
+        # 로그 한 줄 추가라 바로 기록 (기록 순서는 portfolio_manager 의 사용자별 잠금이 보장)
+        if append_portfolio_tombstone(user_id, stocks[i]):
+            pending.add(i)
+        else:
+            ok = False
+            st.error(f"❌ {stocks[i]['name']} 삭제 중 오류가 발생했습니다.")
+    return ok
+
 @st.cache_data(ttl=3600)  # 1시간마다 업데이트
 def get_current_exchange_rate():
     """현재 USD/KRW 고시 환율을 실시간으로 가져오기 (한국은행 기준)"""
     try:
-        # yfinance에서 USD/KRW 환율 데이터 가져오기
-        usd_krw = yf.download("USDKRW=X", period="1d", interval="1d", progress=False)
-        if not usd_krw.empty:
-            rate = usd_krw['Close'].iloc[-1]
-            if hasattr(rate, 'item'):  # numpy scalar 또는 Series
-                rate = float(rate.item())
-            else:
-                rate = float(rate)
+        # 시세 차트(DataFrame) 대신 fast_info 의 현재가 한 개만 받음 → 응답이 작고 DataFrame 생성 없음
+        rate = float(yf.Ticker("USDKRW=X").fast_info.last_price)
+        if rate > 0:  # NaN/0 이면 기본값
             return round(rate, 2)
-    except:
+    except Exception:
         pass
     
     # 실패 시 기본값 (약 1,300원)
     return 1300.0
 
+# 전문가 팝업 상단 지표 카드 HTML (모듈 로드 시 1회 정의, 값만 format 으로 채움)
+_METRIC_CARD = (
+    "<div class='m-card'><div style='color:gray; font-size:0.8rem;'>{label}</div>"
+    "<div class='m-value{cls}'{style}>{value}</div></div>"
+)
+
+# 전문가 팝업 차트: 최근 약 3개월(거래일 기준) 봉만 그림, 그리는 데 쓰는 열만 추려서 전달
+_POPUP_CHART_BARS = 63
+_POPUP_PLOT_COLUMNS = ['Open', 'High', 'Low', 'Close', 'rsi', 'macd', 'macd_sig']
+
+def _sma(values, window):
+    """단순 이동평균 (pandas rolling().mean() 과 같은 값, 앞쪽 window-1 개는 NaN)
+
+    누적합 차분으로 한 번에 계산 → rolling 객체/Series 생성 없이 float64 배열만 사용.
+    """
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
 @st.dialog("🔬 AI 전문가 통합 진단 보고서")
-def show_expert_popup(stock):
-    apply_global_style() # 팝업 내 가독성 강제 적용
-    
+def show_expert_popup(stock, analysis=None):
     # v5.0 엔진 규격 준수: 5개 변수 수령 및 Shape 오류 방어 완료
-    df, score, msg, details, stop_loss = analyze_stock(stock['ticker'], apply_fundamental=True)
+    # 리스트에서 이미 분석한 결과(analysis)를 넘겨받으면 엔진을 다시 부르지 않음
+    if analysis is None:
+        analysis = get_cached_analysis(stock['ticker'], apply_fundamental=True)
+    df, score, msg, details, stop_loss = analysis
     
     if df is not None:
-        curr_p = float(df['Close'].iloc[-1])  # yfinance 원본가 (USD 종목은 USD, KRW 종목은 KRW)
+        curr_p = float(df['Close'].iat[-1])  # yfinance 원본가 (USD 종목은 USD, KRW 종목은 KRW)
         quantity = stock.get('quantity', 0)
         buy_price = stock.get('buy_price', 0)  # 저장된 값 (USD 종목은 원화로 저장됨)
         currency = stock.get('currency', 'KRW')
@@ -79,13 +122,11 @@ def show_expert_popup(stock):
         
         # 3열 메트릭 레이아웃
         m1, m2, m3 = st.columns(3)
-        with m1: st.markdown(f"<div class='m-card'><div style='color:gray; font-size:0.8rem;'>수익률</div><div class='m-value {p_color}'>{profit:+.2f}%</div></div>", unsafe_allow_html=True)
+        with m1: st.markdown(_METRIC_CARD.format(label="수익률", cls=f" {p_color}", style="", value=f"{profit:+.2f}%"), unsafe_allow_html=True)
         with m2: 
-            if currency == "USD":
-                st.markdown(f"<div class='m-card'><div style='color:gray; font-size:0.8rem;'>평가금액</div><div class='m-value'>${total_val_usd:,.2f}</div></div>", unsafe_allow_html=True)
-            else:
-                st.markdown(f"<div class='m-card'><div style='color:gray; font-size:0.8rem;'>평가금액</div><div class='m-value'>₩{int(total_val_usd):,}</div></div>", unsafe_allow_html=True)
-        with m3: st.markdown(f"<div class='m-card'><div style='color:gray; font-size:0.8rem;'>AI 점수</div><div class='m-value' style='color:white;'>{score}점</div></div>", unsafe_allow_html=True)
+            eval_text = f"${total_val_usd:,.2f}" if currency == "USD" else f"₩{int(total_val_usd):,}"
+            st.markdown(_METRIC_CARD.format(label="평가금액", cls="", style="", value=eval_text), unsafe_allow_html=True)
+        with m3: st.markdown(_METRIC_CARD.format(label="AI 점수", cls="", style=" style='color:white;'", value=f"{score}점"), unsafe_allow_html=True)
         
         st.write("---")
         st.markdown(f"#### 🚩 **{msg}**")
@@ -121,22 +162,31 @@ def show_expert_popup(stock):
         # 🎯 [신규] 기술지표 차트 렌더링
         st.write("### 📈 가격 추이 & 지표 시각화")
         
+        # 지표·이동평균은 전체 구간(1년)으로 계산된 상태 → 차트에는 제목대로 최근 3개월 봉의 그리는 열만 넘김
+        # (분석 DataFrame 의 나머지 지표 열과 9개월치 봉은 브라우저로 보낼 필요 없음)
+        df_plot = df[[c for c in _POPUP_PLOT_COLUMNS if c in df.columns]].tail(_POPUP_CHART_BARS)
+        
         # 캔들스틱 차트 + RSI
         fig = go.Figure()
         
-        # 캔들스틱
+        # 캔들스틱 (OHLC 도 float32 로 넘겨 base64 바이너리 전송 - 가격 유효숫자 7자리면 충분)
         fig.add_trace(go.Candlestick(
-            x=df.index,
-            open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'],
+            x=df_plot.index,
+            open=df_plot['Open'].to_numpy(dtype=np.float32),
+            high=df_plot['High'].to_numpy(dtype=np.float32),
+            low=df_plot['Low'].to_numpy(dtype=np.float32),
+            close=df_plot['Close'].to_numpy(dtype=np.float32),
             name='가격'
         ))
         
         # 이동평균선
         if 'Close' in df.columns:
-            ma20 = df['Close'].rolling(window=20).mean()
-            ma60 = df['Close'].rolling(window=60).mean()
-            fig.add_trace(go.Scatter(x=df.index, y=ma20, mode='lines', name='20일 이동평균', line=dict(color='orange')))
-            fig.add_trace(go.Scatter(x=df.index, y=ma60, mode='lines', name='60일 이동평균', line=dict(color='blue')))
+            close_np = df['Close'].to_numpy(dtype=np.float64)
+            # 선 차트는 WebGL(Scattergl) + float32 배열 → 브라우저 GPU 렌더링, 전송은 base64 바이너리
+            ma20 = _sma(close_np, 20)[-_POPUP_CHART_BARS:].astype(np.float32)
+            ma60 = _sma(close_np, 60)[-_POPUP_CHART_BARS:].astype(np.float32)
+            fig.add_trace(go.Scattergl(x=df_plot.index, y=ma20, mode='lines', name='20일 이동평균', line=dict(color='orange')))
+            fig.add_trace(go.Scattergl(x=df_plot.index, y=ma60, mode='lines', name='60일 이동평균', line=dict(color='blue')))
         
         fig.update_layout(
             title=f"{stock['name']} 캔들스틱 차트 (최근 3개월)",
@@ -149,9 +199,9 @@ def show_expert_popup(stock):
         st.plotly_chart(fig, use_container_width=True)
         
         # RSI 차트
-        if 'rsi' in df.columns:
+        if 'rsi' in df_plot.columns:
             fig_rsi = go.Figure()
-            fig_rsi.add_trace(go.Scatter(x=df.index, y=df['rsi'], mode='lines', name='RSI(14)', line=dict(color='purple')))
+            fig_rsi.add_trace(go.Scattergl(x=df_plot.index, y=df_plot['rsi'].to_numpy(dtype=np.float32), mode='lines', name='RSI(14)', line=dict(color='purple')))
             fig_rsi.add_hline(y=70, line_dash="dash", line_color="red", annotation_text="과매수(70)")
             fig_rsi.add_hline(y=30, line_dash="dash", line_color="green", annotation_text="과매도(30)")
             fig_rsi.update_layout(
@@ -165,10 +215,10 @@ def show_expert_popup(stock):
             st.plotly_chart(fig_rsi, use_container_width=True)
         
         # MACD 차트
-        if 'macd' in df.columns and 'macd_sig' in df.columns:
+        if 'macd' in df_plot.columns and 'macd_sig' in df_plot.columns:
             fig_macd = go.Figure()
-            fig_macd.add_trace(go.Scatter(x=df.index, y=df['macd'], mode='lines', name='MACD', line=dict(color='blue')))
-            fig_macd.add_trace(go.Scatter(x=df.index, y=df['macd_sig'], mode='lines', name='Signal', line=dict(color='red')))
+            fig_macd.add_trace(go.Scattergl(x=df_plot.index, y=df_plot['macd'].to_numpy(dtype=np.float32), mode='lines', name='MACD', line=dict(color='blue')))
+            fig_macd.add_trace(go.Scattergl(x=df_plot.index, y=df_plot['macd_sig'].to_numpy(dtype=np.float32), mode='lines', name='Signal', line=dict(color='red')))
             fig_macd.update_layout(
                 title="MACD (Moving Average Convergence Divergence)",
                 xaxis_title="날짜",
@@ -180,31 +230,114 @@ def show_expert_popup(stock):
             st.plotly_chart(fig_macd, use_container_width=True)
     else: st.error("❌ 데이터 로드 실패")
 
-def show_rebalancing_analysis(my_stocks):
-    """포트폴리오 리밸런싱 분석 함수 - Enhanced UI"""
+# 리밸런싱 차트가 읽는 숫자 열 (세션 캐시 키에 포함 - 색상은 조정제안에서 결정됨)
+_REBALANCE_FIG_COLUMNS = ['현재비중(%)', '목표비중(%)', '조정후비중(%)', '조정제안', '변동성', 'AI점수']
+
+def _build_rebalance_figures(df_p):
+    """리밸런싱 분석 차트 생성 (현재/목표/조정 후 비중 파이 3개를 한 Figure 에, 비중 비교 막대, Risk-Return 산점도)"""
+    # 파이 3개는 domain 서브플롯 한 장으로 → 레이아웃/템플릿 처리와 plotly_chart 전송이 1회, 같은 종목은 같은 색
+    names = df_p['종목명'].tolist()
+    fig_pies = make_subplots(
+        rows=1, cols=3, specs=[[{'type': 'domain'}] * 3],
+        subplot_titles=("현재 포트폴리오", "AI 권장 최적 비중", "조정 후 예상 비중"),
+    )
+    for col, column in enumerate(('현재비중(%)', '목표비중(%)', '조정후비중(%)'), start=1):
+        fig_pies.add_trace(
+            go.Pie(labels=names, values=df_p[column].to_numpy(dtype=np.float32), name=column, hole=.3),
+            row=1, col=col,
+        )
+    fig_pies.update_layout(template="plotly_dark", height=400)
+
+    fig_adjust = go.Figure(data=[
+        go.Bar(name='현재 비중', x=df_p['종목명'], y=df_p['현재비중(%)'], marker_color='#3498db'),
+        go.Bar(name='목표 비중', x=df_p['종목명'], y=df_p['목표비중(%)'], marker_color='#e74c3c')
+    ])
+    fig_adjust.update_layout(
+        barmode='group',
+        title="현재 비중 vs 목표 비중",
+        xaxis_title="종목",
+        yaxis_title="비중 (%)",
+        template="plotly_dark",
+        height=400
+    )
+
+    # 종목마다 trace 를 추가하지 않고 배열 하나짜리 trace 1개로 그림 (크기/색상/라벨도 배열로 전달)
+    fig_risk = go.Figure(go.Scatter(
+        x=df_p['변동성'].to_numpy(dtype=np.float32),
+        y=df_p['AI점수'].to_numpy(dtype=np.float32),
+        mode='markers+text',
+        marker=dict(
+            size=(df_p['현재비중(%)'].to_numpy() * 5).astype(np.int32) + 10,
+            color=df_p['색상'].tolist(),
+            opacity=0.6,
+        ),
+        text=df_p['종목명'].tolist(),
+        textposition='top center',
+        hovertemplate="<b>%{text}</b><br>변동성: %{x:.2f}%<br>AI점수: %{y:.0f}점<extra></extra>",
+    ))
+    fig_risk.update_layout(
+        title="Risk-Return 포지셔닝",
+        xaxis_title="변동성 (위험도)",
+        yaxis_title="AI 신뢰도 (수익성)",
+        template="plotly_dark",
+        height=400,
+        showlegend=False
+    )
+    return fig_pies, fig_adjust, fig_risk
+
+def _analyze_holdings(my_stocks):
+    """보유 종목 전체를 묶음 다운로드 1회로 분석 → {ticker: analyze_stock 5-튜플} (실패 시 빈 dict)
+
+    (티커 묶음, apply_fundamental) 가 같으면 같은 캐시 항목을 씀 — 한 번의 실행 안에서는 결과 dict 자체를 넘겨 재사용.
+    """
+    if not my_stocks:
+        return {}
+    try:
+        return get_cached_analysis_batch(
+            tuple(s['ticker'] for s in my_stocks), apply_fundamental=True
+        )
+    except Exception:
+        return {}
+
+def show_rebalancing_analysis(my_stocks, results_by_ticker=None):
+    """포트폴리오 리밸런싱 분석 함수 - Enhanced UI
+
+    results_by_ticker: 호출부(목록 화면)에서 이미 받아 둔 분석 결과 — 없으면 여기서 묶음 분석.
+    """
     if not my_stocks:
         st.warning("먼저 종목을 등록하십시오.")
         return
 
     st.info("💡 본 진단은 AI 신뢰 점수와 기술적 지표를 기반으로 한 포트폴리오 최적화 컨설팅입니다.")
 
-    results = []
     failed_stocks = []
-    total_eval_value = 0
-    # 해외(USD) 원문 합계(USD 기준)
-    total_eval_value_usd = 0.0
+
+    # 종목별 원시 값만 컬럼별 배열(SoA)에 채우고, 원화 환산·변화율·평가액은 루프 뒤 배열 연산 한 번으로 계산
+    n = len(my_stocks)
+    names, tickers, currencies, msgs = [], [], [], []
+    curr_raw = np.empty(n)
+    prev_raw = np.empty(n)
+    quantities = np.empty(n)
+    scores = np.empty(n)
+    fx_rates = np.empty(n)
+    k = 0  # 분석에 성공한 종목 수 (배열의 앞쪽 k칸만 유효)
     
     with st.status("🚀 포트폴리오 정밀 해부 중...", expanded=True) as status:
         # [환율 전역 캐시] 루프 전 1회 호출 — 루프 내 반복 API 호출 제거
         fx_rate_session = float(get_current_exchange_rate())
 
+        # 보유 종목 시세를 묶음 다운로드 1회로 받고(재무 검증은 엔진이 스레드로 병렬 처리) 원화 환산만 순서대로 처리
+        if results_by_ticker is None:
+            results_by_ticker = _analyze_holdings(my_stocks)
+
         for stock in my_stocks:
             try:
-                df, score, msg, _, _ = analyze_stock(stock['ticker'], apply_fundamental=True)
+                analysis = results_by_ticker[stock['ticker']]
+                df, score, msg, _, _ = analysis
                 if df is not None and score is not None:
-                    # 원화 환산 처리: 글로벌(USD) 자산은 환율을 적용하여 KRW로 통일
-                    curr_price = float(df['Close'].iloc[-1])
-                    prev_price = float(df['Close'].iloc[-2]) if len(df) > 1 else curr_price
+                    close = df['Close']
+                    curr_price = float(close.iat[-1])
+                    prev_price = float(close.iat[-2]) if len(close) > 1 else curr_price
 
                     currency = stock.get('currency', 'KRW')
                     exchange_rate = stock.get('exchange_rate', None)
@@ -212,36 +345,16 @@ def show_rebalancing_analysis(my_stocks):
                     if currency == 'USD' and (not exchange_rate or exchange_rate == 1.0):
                         exchange_rate = fx_rate_session
 
-                    if currency == 'USD':
-                        curr_price_krw = curr_price * exchange_rate
-                        prev_price_krw = prev_price * exchange_rate
-                        # 원문(USD) 합계에 더함
-                        total_eval_value_usd += curr_price * float(stock.get('quantity', 0))
-                    else:
-                        curr_price_krw = curr_price
-                        prev_price_krw = prev_price
-
-                    change_rate = ((curr_price_krw - prev_price_krw) / prev_price_krw * 100) if prev_price_krw != 0 else 0
-                    eval_val = curr_price_krw * stock['quantity']
-                    total_eval_value += eval_val
-                    
-                    results.append({
-                        "종목명": stock['name'],
-                        "티커": stock['ticker'],
-                        # 현재가는 원화 기준으로 통일하여 표시
-                        "현재가": curr_price_krw,
-                        # 원문 가격/통화 정보도 함께 보관
-                        "원문현재가": curr_price,
-                        "원문통화": currency,
-                        "보유수량": stock['quantity'],
-                        "평가금액": eval_val,
-                        "원문평가금액": curr_price * stock['quantity'] if currency == 'USD' else None,
-                        "변화율": change_rate,
-                        "AI점수": score,
-                        "상태": msg,
-                        "통화": stock.get('currency', 'KRW'),
-                        "환율": exchange_rate if exchange_rate is not None else 1.0
-                    })
+                    curr_raw[k] = curr_price
+                    prev_raw[k] = prev_price
+                    quantities[k] = float(stock['quantity'])
+                    scores[k] = score
+                    fx_rates[k] = exchange_rate if exchange_rate is not None else 1.0
+                    names.append(stock['name'])
+                    tickers.append(stock['ticker'])
+                    currencies.append(currency)
+                    msgs.append(msg)
+                    k += 1
                 else:
                     failed_stocks.append(stock['name'])
             except Exception as e:
@@ -252,8 +365,36 @@ def show_rebalancing_analysis(my_stocks):
     if failed_stocks:
         st.warning(f"⚠️ {', '.join(failed_stocks)} 데이터를 불러올 수 없습니다. 티커를 확인하세요.")
 
-    if results and total_eval_value > 0:
-        df_p = pd.DataFrame(results)
+    # 원화 환산 처리: 글로벌(USD) 자산은 환율을 적용하여 KRW로 통일 (현재가는 원화 기준으로 표시)
+    curr_raw, prev_raw, quantities = curr_raw[:k], prev_raw[:k], quantities[:k]
+    is_usd = np.array(currencies, dtype=object) == 'USD'
+    curr_krw = np.where(is_usd, curr_raw * fx_rates[:k], curr_raw)
+    prev_krw = np.where(is_usd, prev_raw * fx_rates[:k], prev_raw)
+    change_rates = np.zeros(k)
+    np.divide(curr_krw - prev_krw, prev_krw, out=change_rates, where=prev_krw != 0)
+    change_rates *= 100
+    eval_vals = curr_krw * quantities
+    total_eval_value = float(eval_vals.sum())
+    # 해외(USD) 원문 합계(USD 기준)
+    eval_raw_usd = np.where(is_usd, curr_raw * quantities, np.nan)
+    total_eval_value_usd = float(np.nansum(eval_raw_usd))
+
+    if k and total_eval_value > 0:
+        df_p = pd.DataFrame({
+            "종목명": names,
+            "티커": tickers,
+            "현재가": curr_krw,
+            "원문현재가": curr_raw,
+            "원문통화": currencies,
+            "보유수량": quantities,
+            "평가금액": eval_vals,
+            "원문평가금액": eval_raw_usd,
+            "변화율": change_rates,
+            "AI점수": scores[:k],
+            "상태": msgs,
+            "통화": currencies,
+            "환율": fx_rates[:k],
+        })
         
         # 현재 비중 계산
         df_p['현재비중(%)'] = (df_p['평가금액'] / total_eval_value) * 100
@@ -268,20 +409,14 @@ def show_rebalancing_analysis(my_stocks):
         df_p['조정제안'] = df_p['목표비중(%)'] - df_p['현재비중(%)']
         df_p['조정금액'] = (df_p['조정제안'] / 100) * total_eval_value
         
-        # 색상 그라데이션: 조정 필요도
-        def get_action_color(adjustment):
-            if adjustment > 10:
-                return "#ff4444"  # 강한 매수
-            elif adjustment > 5:
-                return "#ff8844"  # 약한 매수
-            elif adjustment < -10:
-                return "#4444ff"  # 강한 매도
-            elif adjustment < -5:
-                return "#8844ff"  # 약한 매도
-            else:
-                return "#44ff44"  # 유지
-        
-        df_p['색상'] = df_p['조정제안'].apply(get_action_color)
+        # 색상 그라데이션: 조정 필요도 (강한 매수 / 약한 매수 / 강한 매도 / 약한 매도 / 유지)
+        # 행마다 파이썬 함수를 부르지 않고 조건 배열로 한 번에 선택
+        adj = df_p['조정제안'].to_numpy()
+        df_p['색상'] = np.select(
+            [adj > 10, adj > 5, adj < -10, adj < -5],
+            ["#ff4444", "#ff8844", "#4444ff", "#8844ff"],
+            default="#44ff44",
+        )
         
         # 0. 포트폴리오 개요
         st.markdown("### 📈 포트폴리오 개요")
@@ -310,62 +445,29 @@ def show_rebalancing_analysis(my_stocks):
         st.markdown("### 📊 포트폴리오 리밸런싱 분석")
         st.write("**현재 비중 vs AI 권장 최적 비중 비교**: 각 종목이 현재 얼마의 비중을 차지하고 있으며, AI가 제시하는 최적 비중은 얼마인지 시각화합니다.")
         
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            fig_curr = px.pie(df_p, values='현재비중(%)', names='종목명', title="현재 포트폴리오", hole=.3, template="plotly_dark")
-            st.plotly_chart(fig_curr, use_container_width=True)
-        with c2:
-            fig_target = px.pie(df_p, values='목표비중(%)', names='종목명', title="AI 권장 최적 비중", hole=.3, template="plotly_dark")
-            st.plotly_chart(fig_target, use_container_width=True)
-        with c3:
-            # 조정 후 예상 비중
-            df_p['조정후비중(%)'] = df_p['현재비중(%)'] + df_p['조정제안']
-            fig_after = px.pie(df_p, values='조정후비중(%)', names='종목명', title="조정 후 예상 비중", hole=.3, template="plotly_dark")
-            st.plotly_chart(fig_after, use_container_width=True)
+        # 조정 후 예상 비중 / 변동성 (차트·카드 공용)
+        df_p['조정후비중(%)'] = df_p['현재비중(%)'] + df_p['조정제안']
+        df_p['변동성'] = abs(df_p['변화율'])
+
+        # 같은 종목·같은 수치로 다시 그리는 rerun(카드의 시뮬레이션 버튼 등)이면 Plotly 객체를 새로 만들지 않고 세션에 둔 것을 재사용
+        # (키 하나에 마지막 차트 묶음만 보관 → 세션 메모리가 쌓이지 않음)
+        fig_key = (tuple(df_p['종목명']), df_p[_REBALANCE_FIG_COLUMNS].to_numpy().tobytes())
+        cached = st.session_state.get("rebalance_figs")
+        if cached is None or cached[0] != fig_key:
+            cached = (fig_key, _build_rebalance_figures(df_p))
+            st.session_state["rebalance_figs"] = cached
+        fig_pies, fig_adjust, fig_risk = cached[1]
+
+        st.plotly_chart(fig_pies, use_container_width=True)
 
         # 2. 비중 조정 계획
         st.markdown("### 🔄 비중 조정 계획")
         st.write("**막대 그래프 해석**: 파란색은 현재 비중, 빨간색은 목표 비중입니다. 금액 차이가 클수록 더 큰 조정이 필요합니다.")
-        
-        fig_adjust = go.Figure(data=[
-            go.Bar(name='현재 비중', x=df_p['종목명'], y=df_p['현재비중(%)'], marker_color='#3498db'),
-            go.Bar(name='목표 비중', x=df_p['종목명'], y=df_p['목표비중(%)'], marker_color='#e74c3c')
-        ])
-        fig_adjust.update_layout(
-            barmode='group',
-            title="현재 비중 vs 목표 비중",
-            xaxis_title="종목",
-            yaxis_title="비중 (%)",
-            template="plotly_dark",
-            height=400
-        )
         st.plotly_chart(fig_adjust, use_container_width=True)
 
         # 3. Risk-Return Scatter
         st.markdown("### 📉 Risk-Return 분석")
         st.write("**차트 해석**: X축은 변동성(위험도), Y축은 AI 신뢰도(수익성)입니다. 우상향은 높은 수익 잠재력, 하좌향은 낮은 위험을 의미합니다.")
-        
-        df_p['변동성'] = abs(df_p['변화율'])
-        fig_risk = go.Figure()
-        
-        for idx, row in df_p.iterrows():
-            fig_risk.add_trace(go.Scatter(
-                x=[row['변동성']], y=[row['AI점수']], 
-                mode='markers+text',
-                marker=dict(size=int(row['현재비중(%)']*5)+10, color=row['색상'], opacity=0.6),
-                text=row['종목명'],
-                textposition='top center',
-                hovertemplate=f"<b>{row['종목명']}</b><br>변동성: {row['변동성']:.2f}%<br>AI점수: {row['AI점수']:.0f}점<extra></extra>"
-            ))
-        
-        fig_risk.update_layout(
-            title="Risk-Return 포지셔닝",
-            xaxis_title="변동성 (위험도)",
-            yaxis_title="AI 신뢰도 (수익성)",
-            template="plotly_dark",
-            height=400,
-            showlegend=False
-        )
         st.plotly_chart(fig_risk, use_container_width=True)
 
         st.write("---")
@@ -383,40 +485,68 @@ def show_rebalancing_analysis(my_stocks):
             '종목명', 'AI점수', '현재비중(%)', '목표비중(%)', 
             '조정제안', '조정금액', '변화율'
         ]].copy()
-        summary_df['AI점수'] = summary_df['AI점수'].apply(lambda x: f"{x:.0f}점")
-        summary_df['현재비중(%)'] = summary_df['현재비중(%)'].apply(lambda x: f"{x:.1f}%")
-        summary_df['목표비중(%)'] = summary_df['목표비중(%)'].apply(lambda x: f"{x:.1f}%")
-        summary_df['조정제안'] = summary_df['조정제안'].apply(lambda x: f"{x:+.1f}%")
-        summary_df['조정금액'] = summary_df['조정금액'].apply(lambda x: f"{int(x):+,}원")
-        summary_df['변화율'] = summary_df['변화율'].apply(lambda x: f"{x:+.2f}%")
-        
-        st.dataframe(summary_df, use_container_width=True, hide_index=True)
+        # 숫자 열은 그대로 두고 표시 형식은 column_config 에 맡김 (열마다 .apply 문자열 변환 없음, 정렬도 숫자 기준)
+        # 천 단위 구분 + 부호가 필요한 조정금액만 한 번의 리스트 변환으로 문자열화
+        summary_df['조정금액'] = [f"{int(x):+,}원" for x in summary_df['조정금액'].to_numpy()]
+        
+        st.dataframe(
+            summary_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "AI점수": st.column_config.NumberColumn(format="%.0f점"),
+                "현재비중(%)": st.column_config.NumberColumn(format="%.1f%%"),
+                "목표비중(%)": st.column_config.NumberColumn(format="%.1f%%"),
+                "조정제안": st.column_config.NumberColumn(format="%+.1f%%"),
+                "변화율": st.column_config.NumberColumn(format="%+.2f%%"),
+            },
+        )
         
         st.write("")
         
-        # 상세 카드
-        for idx, row in df_p.iterrows():
-            adjustment = float(row['조정제안'])
-            
-            # 액션 타입 결정
-            if adjustment > 5:
-                action_emoji = "🔥"
-                action_label = "비중 확대"
-                action_color = "🟢"
-            elif adjustment < -5:
-                action_emoji = "🚨"
-                action_label = "비중 축소"
-                action_color = "🔴"
-            else:
-                action_emoji = "⚖️"
-                action_label = "유지"
-                action_color = "🟡"
+        # 상세 카드 — 카드에 쓰는 열만 식별자 이름으로 바꿔 itertuples 로 순회
+        # (iterrows 처럼 행마다 Series 를 만들지 않고, 값은 이미 float64 라 float() 변환도 불필요)
+        card_columns = {
+            '종목명': 'name',
+            '티커': 'ticker',
+            'AI점수': 'score',
+            '평가금액': 'eval_val',
+            '변화율': 'change',
+            '현재비중(%)': 'curr_pct',
+            '목표비중(%)': 'target_pct',
+            '조정제안': 'adj',
+            '조정금액': 'adj_amount',
+            '상태': 'status',
+            '조정후비중(%)': 'after_pct',
+        }
+        # 액션 타입(확대/축소/유지)도 카드 루프 전에 조건 배열로 한 번에 결정
+        action_conds = [adj > 5, adj < -5]
+        df_view = df_p[list(card_columns)].rename(columns=card_columns).assign(
+            action_emoji=np.select(action_conds, ["🔥", "🚨"], default="⚖️"),
+            action_label=np.select(action_conds, ["비중 확대", "비중 축소"], default="유지"),
+            action_color=np.select(action_conds, ["🟢", "🔴"], default="🟡"),
+        )
+        if len(df_view) > TABLE_MODE_THRESHOLD:
+            # 종목이 많으면 카드 N개(카드당 위젯 10여 개) 대신 위 요약표 + 고른 종목 카드 1개만 출력
+            card_names = df_view['name']
+            picked = st.selectbox(
+                "🔍 상세 전략을 볼 종목", df_view.index,
+                format_func=lambda i: card_names.at[i], key="reb_detail_sb",
+            )
+            card_rows = df_view.loc[[picked]].itertuples()
+        else:
+            card_rows = df_view.itertuples()
+
+        for row in card_rows:
+            idx = row.Index
+            adjustment = row.adj
+            action_emoji, action_label, action_color = row.action_emoji, row.action_label, row.action_color
             
             with st.container(border=True):
                 # 상단: 종목명과 액션
                 col_header = st.columns([2, 1])
                 with col_header[0]:
-                    st.markdown(f"### {action_emoji} {row['종목명']} ({row['티커']})")
+                    st.markdown(f"### {action_emoji} {row.name} ({row.ticker})")
                 with col_header[1]:
                     st.markdown(f"<div style='text-align: right; font-size: 1.5rem;'>{action_color} {action_label}</div>", unsafe_allow_html=True)
                 
@@ -427,7 +557,7 @@ def show_rebalancing_analysis(my_stocks):
                 
                 with col_left:
                     st.markdown("#### 📊 AI 분석")
-                    ai_score = float(row['AI점수'])
+                    ai_score = row.score
                     if ai_score >= 80:
                         score_emoji = "🏆"
                     elif ai_score >= 70:
@@ -436,20 +566,20 @@ def show_rebalancing_analysis(my_stocks):
                         score_emoji = "⚠️"
                     st.metric(f"{score_emoji} AI 신뢰도", str(f"{ai_score:.0f}점"))
                     
-                    profit_loss = float(row['평가금액']) * float(row['변화율']) / 100
+                    profit_loss = row.eval_val * row.change / 100
                     profit_icon = "📈" if profit_loss >= 0 else "📉"
                     st.metric(f"{profit_icon} 손익", str(f"{int(profit_loss):,}원"), 
-                             delta=str(f"{float(row['변화율']):+.2f}%"))
+                             delta=str(f"{row.change:+.2f}%"))
                 
                 with col_mid:
                     st.markdown("#### 💰 비중 현황")
-                    st.metric("현재 비중", str(f"{float(row['현재비중(%)']):,.1f}%"))
-                    st.metric("목표 비중", str(f"{float(row['목표비중(%)']):,.1f}%"))
+                    st.metric("현재 비중", str(f"{row.curr_pct:,.1f}%"))
+                    st.metric("목표 비중", str(f"{row.target_pct:,.1f}%"))
                 
                 with col_right:
                     st.markdown("#### 🎯 조정 제안")
                     st.metric("조정 필요량", str(f"{adjustment:+.1f}%"))
-                    adjustment_amount = float(row['조정금액'])
+                    adjustment_amount = row.adj_amount
                     st.metric("조정 금액", str(f"{int(adjustment_amount):+,}원"))
                 
                 st.write("---")
@@ -459,10 +589,10 @@ def show_rebalancing_analysis(my_stocks):
                     advice = f"""
 🔥 **강한 매수 권장**
 
-{row['종목명']}의 AI 신뢰도가 **{ai_score:.0f}점**으로 높지만, 현재 비중({float(row['현재비중(%)']):,.1f}%)이 목표 비중({float(row['목표비중(%)']):,.1f}%)보다 크게 부족합니다.
+{row.name}의 AI 신뢰도가 **{ai_score:.0f}점**으로 높지만, 현재 비중({row.curr_pct:,.1f}%)이 목표 비중({row.target_pct:,.1f}%)보다 크게 부족합니다.
 
 **추가 매수 금액**: {int(abs(adjustment_amount)):,}원
-**현재 강점**: {row['상태']}
+**현재 강점**: {row.status}
 
 추세 흐름이 상승하고 있으니, 자금 여유가 있다면 이 구간에서 추가 매수를 고려하실 타이밍입니다. 
 큰손들의 수급이 활발한 상황이므로 적극적으로 포지션을 키우는 것도 좋아요.
@@ -471,7 +601,7 @@ def show_rebalancing_analysis(my_stocks):
                     advice = f"""
 📈 **중약한 매수 추천**
 
-{row['종목명']}은 AI 신뢰도 {ai_score:.0f}점으로 양호하지만, 현재 비중 조정이 필요합니다.
+{row.name}은 AI 신뢰도 {ai_score:.0f}점으로 양호하지만, 현재 비중 조정이 필요합니다.
 
 **추가 매수 금액**: {int(abs(adjustment_amount)):,}원
 
@@ -481,10 +611,10 @@ def show_rebalancing_analysis(my_stocks):
                     advice = f"""
 🚨 **강한 매도 권장**
 
-{row['종목명']}의 비중({float(row['현재비중(%)']):,.1f}%)이 목표 비중({float(row['목표비중(%)']):,.1f}%)보다 크게 초과되어 있습니다.
+{row.name}의 비중({row.curr_pct:,.1f}%)이 목표 비중({row.target_pct:,.1f}%)보다 크게 초과되어 있습니다.
 
 **매도 권장 금액**: {int(abs(adjustment_amount)):,}원
-**현재 상태**: {row['상태']}
+**현재 상태**: {row.status}
 
 수익 확정이나 손절을 고려해야 할 시점입니다. 더 강한 종목으로 갈아타거나 위험 노출을 줄이시길 권장합니다.
                     """
@@ -492,7 +622,7 @@ def show_rebalancing_analysis(my_stocks):
                     advice = f"""
 📉 **중약한 매도 추천**
 
-{row['종목명']}의 비중 재조정이 필요합니다.
+{row.name}의 비중 재조정이 필요합니다.
 
 **매도 권장 금액**: {int(abs(adjustment_amount)):,}원
 
@@ -503,10 +633,10 @@ def show_rebalancing_analysis(my_stocks):
                     advice = f"""
 ⚖️ **현재 보유 유지**
 
-{row['종목명']}은 현재 비중 배치가 적절합니다.
+{row.name}은 현재 비중 배치가 적절합니다.
 
 **AI 신뢰도**: {ai_score:.0f}점
-**평가액**: {int(float(row['평가금액'])):,}원
+**평가액**: {int(row.eval_val):,}원
 
 추가 매수나 매도할 필요가 없습니다. 시장 흐름을 관망하면서 
 다음 신호를 기다리세요. 무리한 조정은 오히려 수익 기회를 놓칠 수 있습니다.
@@ -524,16 +654,16 @@ def show_rebalancing_analysis(my_stocks):
                 # 시뮬레이션 결과 표시
                 if st.session_state.get(f"simulate_{idx}", False):
                     st.success(f"""
-✅ **{row['종목명']} 주문 시뮬레이션**
+✅ **{row.name} 주문 시뮬레이션**
 
 **현재 상태**
-- 현재 비중: {float(row['현재비중(%)']):,.1f}%
-- 평가액: {int(float(row['평가금액'])):,}원
+- 현재 비중: {row.curr_pct:,.1f}%
+- 평가액: {int(row.eval_val):,}원
 
 **조정 후 예상**
-- 목표 비중: {float(row['목표비중(%)']):,.1f}%
+- 목표 비중: {row.target_pct:,.1f}%
 - 조정 금액: {int(abs(adjustment_amount)):,}원
-- 예상 비중: {float(row['조정후비중(%)']):,.1f}%
+- 예상 비중: {row.after_pct:,.1f}%
 
 이 시뮬레이션은 실제 주문이 아닙니다. 참고만 하시기 바랍니다.
                     """)
@@ -581,9 +711,25 @@ def show_rebalancing_analysis(my_stocks):
     else:
         st.error("❌ 분석 가능한 종목이 없습니다. 데이터를 다시 확인하세요.")
 
+def _apply_pending_deletes():
+    """삭제 대기열을 세션 목록에 한 번에 반영 (파일에는 삭제 시점에 이미 tombstone 기록됨)"""
+    pending = st.session_state.get("pf_pending_deletes")
+    if not pending:
+        return
+    st.session_state.my_stocks = [
+        s for i, s in enumerate(st.session_state.my_stocks) if i not in pending
+    ]
+    pending.clear()
+
 def run_portfolio_tab(unused_stock_dict):
     user_id = st.session_state.user_id
-    st.session_state.my_stocks = load_portfolio(user_id)
+    # 같은 사용자의 목록이 세션에 있으면 그대로 사용 (위젯 조작 rerun 마다 파일을 다시 읽지 않음)
+    # 등록/삭제는 파일에 로그만 남기고 세션 목록을 직접 고치므로 세션 목록이 기준 데이터
+    if st.session_state.get("my_stocks_user") != user_id or "my_stocks" not in st.session_state:
+        st.session_state.my_stocks = load_portfolio(user_id)
+        st.session_state.my_stocks_user = user_id
+        st.session_state.pf_pending_deletes = set()
+    _apply_pending_deletes()
 
     # --- 0. AI 컨설팅 버튼 ---
     col_btn1, col_btn2, col_btn3 = st.columns([1, 1, 3])
@@ -593,12 +739,20 @@ def run_portfolio_tab(unused_stock_dict):
     with col_btn2:
         if st.button("❌ 닫기", use_container_width=True):
             st.session_state.show_rebalancing = False
+    with col_btn3:
+        # 분석 결과는 15분 캐시 → 최신 시세가 필요할 때만 비우고 다시 받음
+        if st.button("🔄 시세 새로고침", key="pf_refresh_btn", help="캐시된 분석 결과를 버리고 야후에서 다시 받습니다."):
+            clear_analysis_cache()
     
+    # 전 종목을 묶음 다운로드 1회로 미리 분석 → 리밸런싱 조언과 아래 목록이 같은 결과를 공유
+    analyzed_stocks = st.session_state.my_stocks
+    results_by_ticker = _analyze_holdings(analyzed_stocks)
+
     # 리밸런싱 분석 표시
     if st.session_state.get('show_rebalancing', False):
         st.write("---")
         st.markdown("### ⚖️ 전문가 리밸런싱 조언")
-        show_rebalancing_analysis(st.session_state.my_stocks)
+        show_rebalancing_analysis(st.session_state.my_stocks, results_by_ticker)
         st.write("---")
 
     # --- 1. [핵심 수술] 국내 vs 글로벌 등록 모드 이원화 ---
@@ -608,36 +762,43 @@ def run_portfolio_tab(unused_stock_dict):
         st.markdown(f"### ➕ {reg_mode} 신규 등록")
         
         if reg_mode == "🇰🇷 국내 주식":
-            c1, c2, c3, c4 = st.columns([2, 1.2, 1.2, 0.8])
-            
-            with c1:
-                kr_stocks = get_all_krx_stocks()
-                reg_name = st.selectbox("종목 검색", list(kr_stocks.keys()), key="kr_reg_sb")
-                reg_ticker = kr_stocks[reg_name]
-            with c2: 
-                reg_price = st.number_input("평균 매수가 (원)", min_value=0.0, step=100.0, key="p_reg_ni")
-            with c3: 
-                reg_qty = st.number_input("보유좌수 (주)", min_value=0.0, step=1.0, key="q_reg_ni")
-            with c4:
-                st.write(" ")
-                if st.button("등록", type="primary", use_container_width=True):
-                    if reg_ticker and reg_price > 0 and reg_qty > 0:
-                        new_item = {
-                            "name": reg_name, 
-                            "ticker": reg_ticker, 
-                            "buy_price": reg_price,
-                            "quantity": reg_qty,
-                            "buy_date": datetime.now().strftime("%Y-%m-%d")
-                        }
-                        st.session_state.my_stocks.append(new_item)
-                        if save_portfolio(user_id, st.session_state.my_stocks):
-                            st.session_state.my_stocks = load_portfolio(user_id)
-                            st.success(f"✅ {reg_name} 등록 완료!")
-                            st.rerun()
-                        else:
-                            st.error("❌ 등록 중 오류가 발생했습니다.")
-                    else: 
-                        st.error("⚠️ 모든 항목을 입력하고 가격/수량은 0보다 커야 합니다.")
+            # 종목명 → 티커 매핑과 선택지 튜플은 서버 전체에서 1회만 생성 (rerun 마다 수천 개 종목 dict/리스트 복사 방지)
+            kr_stocks, kr_names = get_krx_options()
+
+            # 입력 위젯을 form 으로 묶음 → 값을 고칠 때마다가 아니라 '등록' 제출 시 1회만 rerun
+            with st.form("kr_reg_form", clear_on_submit=True, border=False):
+                c1, c2, c3, c4 = st.columns([2, 1.2, 1.2, 0.8])
+                with c1:
+                    reg_name = st.selectbox("종목 검색", kr_names, key="kr_reg_sb")
+                with c2: 
+                    reg_price = st.number_input("평균 매수가 (원)", min_value=0.0, step=100.0, key="p_reg_ni")
+                with c3: 
+                    reg_qty = st.number_input("보유좌수 (주)", min_value=0.0, step=1.0, key="q_reg_ni")
+                with c4:
+                    st.write(" ")
+                    submitted = st.form_submit_button("등록", type="primary", use_container_width=True)
+
+            if submitted:
+                reg_ticker = kr_stocks.get(reg_name)
+                if reg_ticker and reg_price > 0 and reg_qty > 0:
+                    new_item = {
+                        "name": reg_name, 
+                        "ticker": reg_ticker, 
+                        "buy_price": reg_price,
+                        "quantity": reg_qty,
+                        "buy_date": datetime.now().strftime("%Y-%m-%d")
+                    }
+                    # 전체 파일 재작성 대신 추가 로그 1줄
+                    if append_portfolio_entry(user_id, new_item):
+                        # 파일을 다시 읽지 않고 방금 기록한 항목을 세션 목록 끝에 붙임 (파일 쪽도 로그 끝에 추가됨)
+                        # 새 리스트로 바꿔야 아래 목록 화면이 분석 결과를 다시 계산함
+                        # 제출 자체가 rerun 이고 아래 목록은 갱신된 세션 목록으로 그려지므로 st.rerun() 불필요
+                        st.session_state.my_stocks = [*st.session_state.my_stocks, new_item]
+                        st.success(f"✅ {reg_name} 등록 완료!")
+                    else:
+                        st.error("❌ 등록 중 오류가 발생했습니다.")
+                else: 
+                    st.error("⚠️ 모든 항목을 입력하고 가격/수량은 0보다 커야 합니다.")
         
         else:  # 글로벌 자산
             # 💱 통화 선택 및 고시 환율 자동 조회
@@ -690,9 +851,9 @@ def run_portfolio_tab(unused_stock_dict):
                             "currency": price_currency.split()[0],  # "USD" 또는 "KRW"
                             "exchange_rate": exchange_rate if price_currency == "USD 🇺🇸" else 1.0
                         }
-                        st.session_state.my_stocks.append(new_item)
-                        if save_portfolio(user_id, st.session_state.my_stocks):
-                            st.session_state.my_stocks = load_portfolio(user_id)
+                        # 전체 파일 재작성 대신 추가 로그 1줄
+                        if append_portfolio_entry(user_id, new_item):
+                            st.session_state.my_stocks = [*st.session_state.my_stocks, new_item]
                             st.success(f"✅ {reg_name} 등록 완료! (₩{final_price:,.0f})")
                             st.rerun()
                         else:
@@ -706,42 +867,107 @@ def run_portfolio_tab(unused_stock_dict):
     if not st.session_state.my_stocks:
         st.info("현재 등록된 종목이 없습니다. 상단에서 시장을 선택하고 종목을 추가하십시오.")
     else:
+        # 이번 실행 중 등록 폼 제출로 목록이 새로 로드됐으면 바뀐 목록으로 다시 분석
+        if st.session_state.my_stocks is not analyzed_stocks:
+            results_by_ticker = _analyze_holdings(st.session_state.my_stocks)
+
+        if len(st.session_state.my_stocks) > TABLE_MODE_THRESHOLD:
+            _render_positions_table(st.session_state.my_stocks, results_by_ticker)
+            return
+
         # 최신 등록 종목이 위로 오도록 역순 출력
-        for idx, stock in enumerate(reversed(st.session_state.my_stocks)):
-            actual_idx = len(st.session_state.my_stocks) - 1 - idx
-            with st.container(border=True):
-                try:
-                    result = analyze_stock(stock['ticker'], apply_fundamental=True)
-                    if result and result[0] is not None:
-                        _, score, msg, _, _ = result
-                    else:
-                        score = 0
-                        msg = "⚠️ 데이터 로드 실패 (티커 확인 필요)"
-                except Exception:
-                    score = 0
-                    msg = "⚠️ API 연결 오류"
-                qty = stock.get('quantity', 0)
-                buy_price = stock.get('buy_price', 0)
-                currency = stock.get('currency', 'KRW')
-                exchange_rate = stock.get('exchange_rate', 1.0)
-                
-                c1, c2, c3, c4 = st.columns([1.5, 3.0, 1.5, 0.5])
-                with c1: 
-                    if st.button(f"🔍 {stock['name']}", key=f"b_{actual_idx}", use_container_width=True): 
-                        show_expert_popup(stock)
-                with c2: 
-                    st.markdown(f"<span style='color:#888;'>[{score}점]</span> **{msg}**", unsafe_allow_html=True)
-                with c3:
-                    if currency == "USD":
-                        usd_price = buy_price / exchange_rate
-                        st.write(f"**${usd_price:,.2f}** (₩{buy_price:,.0f})")
-                        st.caption(f"{qty:,.2f}주 보유 중")
-                    else:
-                        st.write(f"**₩{buy_price:,}**")
-                        st.caption(f"{qty:,}주 보유 중")
-                with c4:
-                    if st.button("🗑️", key=f"d_{actual_idx}"):
-                        st.session_state.my_stocks.pop(actual_idx)
-                        save_portfolio(user_id, st.session_state.my_stocks)
-                        st.session_state.my_stocks = load_portfolio(user_id)
-                        st.rerun()
\ No newline at end of file
+        for actual_idx, stock in reversed(list(enumerate(st.session_state.my_stocks))):
+            _render_position(actual_idx, stock, results_by_ticker.get(stock['ticker']), user_id)
+
+
+def _position_status(result):
+    """묶음 분석 결과 → (점수, 진단 메시지)"""
+    if result is None:
+        # 묶음 분석 자체가 실패한 경우
+        return 0, "⚠️ API 연결 오류"
+    if result[0] is not None:
+        return result[1], result[2]
+    return 0, "⚠️ 데이터 로드 실패 (티커 확인 필요)"
+
+
+def _render_positions_table(stocks, results_by_ticker):
+    """보유 종목이 많을 때: 표 1개 + 다중 선택 삭제/진단 (종목 수와 무관하게 요소 몇 개만 전송)"""
+    # 최신 등록 종목이 위로 오도록 역순, 인덱스는 세션 목록의 실제 위치
+    order = range(len(stocks) - 1, -1, -1)
+    rows = [stocks[i] for i in order]
+    status = [_position_status(results_by_ticker.get(s['ticker'])) for s in rows]
+    n = len(rows)
+    # 행 dict 목록 → dtype 추론 대신 열 단위로 바로 구성 (숫자 열은 numpy 배열, 표시 형식은 column_config)
+    df_view = pd.DataFrame(
+        {
+            "종목명": [s['name'] for s in rows],
+            "티커": [s['ticker'] for s in rows],
+            # 점수는 소수 1자리라 float32 로 충분 (Arrow 직렬화 크기 절반), 가격/수량은 환산가·소수 수량이라 float64 유지
+            "AI점수": np.fromiter((score for score, _ in status), dtype=np.float32, count=n),
+            "진단": [msg for _, msg in status],
+            "통화": [s.get('currency', 'KRW') for s in rows],
+            "평균 매수가(₩)": np.fromiter((s.get('buy_price') or 0 for s in rows), dtype=np.float64, count=n),
+            "보유수량": np.fromiter((s.get('quantity') or 0 for s in rows), dtype=np.float64, count=n),
+        },
+        index=order,
+    )
+    st.dataframe(
+        df_view,
+        column_config={
+            "AI점수": st.column_config.NumberColumn(format="%.1f점"),
+            "평균 매수가(₩)": st.column_config.NumberColumn(format="localized"),
+            "보유수량": st.column_config.NumberColumn(format="localized"),
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    def label(i):
+        return f"{stocks[i]['name']} ({stocks[i]['ticker']})"
+
+    c1, c2 = st.columns(2)
+    with c1:
+        target = st.selectbox("🔍 정밀 진단할 종목", order, format_func=label, key="pf_table_diag_sb")
+        if st.button("🔍 진단 보고서 열기", key="pf_table_diag_btn", use_container_width=True):
+            show_expert_popup(stocks[target], results_by_ticker.get(stocks[target]['ticker']))
+    with c2:
+        to_del = st.multiselect("🗑️ 삭제할 종목", order, format_func=label, key="pf_table_del_ms")
+        if st.button("🗑️ 선택 종목 삭제", key="pf_table_del_btn", use_container_width=True, disabled=not to_del):
+            # 대기열에 한꺼번에 올리고 다시 실행 → 맨 위 _apply_pending_deletes 가 세션 목록에 반영
+            if _queue_deletes(st.session_state.user_id, to_del):
+                del st.session_state.pf_table_del_ms
+                st.rerun()
+
+
+# 행 단위 fragment: 행 안의 버튼(🔍 진단/🗑️ 삭제)을 눌러도 해당 행만 다시 실행
+# 삭제는 tombstone 1줄만 기록하고 (성공 시) 행만 숨김, 세션 목록은 다음 전체 실행 때 _apply_pending_deletes 가 반영
+@st.fragment
+def _render_position(actual_idx, stock, result, user_id):
+    pending = st.session_state.setdefault("pf_pending_deletes", set())
+    if actual_idx in pending:
+        return
+    with st.container(border=True):
+        score, msg = _position_status(result)
+        qty = stock.get('quantity', 0)
+        buy_price = stock.get('buy_price', 0)
+        currency = stock.get('currency', 'KRW')
+        exchange_rate = stock.get('exchange_rate', 1.0)
+        
+        c1, c2, c3, c4 = st.columns([1.5, 3.0, 1.5, 0.5])
+        with c1: 
+            if st.button(f"🔍 {stock['name']}", key=f"b_{actual_idx}", use_container_width=True): 
+                show_expert_popup(stock, result)
+        with c2: 
+            st.markdown(f"<span style='color:#888;'>[{score}점]</span> **{msg}**", unsafe_allow_html=True)
+        with c3:
+            if currency == "USD":
+                usd_price = buy_price / exchange_rate
+                st.write(f"**${usd_price:,.2f}** (₩{buy_price:,.0f})")
+                st.caption(f"{qty:,.2f}주 보유 중")
+            else:
+                st.write(f"**₩{buy_price:,}**")
+                st.caption(f"{qty:,}주 보유 중")
+        with c4:
+            if st.button("🗑️", key=f"d_{actual_idx}"):
+                if _queue_deletes(user_id, (actual_idx,)):
+                    st.rerun(scope="fragment")
@@ -1,12 +1,11 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-from engine import analyze_stock
-from style_utils import apply_global_style
+from market_data import get_cached_analysis_batch
 
 def run_rebalancing_tab(my_stocks):
-    apply_global_style()
     st.markdown("<h1 style='color:white; font-weight:800;'>⚖️ 전문가 리밸런싱 조언</h1>", unsafe_allow_html=True)
     
     if not my_stocks:
@@ -20,13 +19,19 @@ def run_rebalancing_tab(my_stocks):
     total_eval_value = 0
     
     with st.status("🚀 포트폴리오 정밀 해부 중...", expanded=True) as status:
+        # 보유 종목 일봉을 묶음 다운로드 1회로 받고 종목별 분석은 로컬 계산 (15분 캐시, 빠진 종목만 개별 재시도)
+        try:
+            results_by_ticker = get_cached_analysis_batch(tuple(s['ticker'] for s in my_stocks))
+        except Exception:
+            results_by_ticker = {}
+
         for stock in my_stocks:
             # v5.0 엔진으로 실시간 데이터 및 점수 추출
             try:
-                df, score, msg, _, _ = analyze_stock(stock['ticker'])
+                df, score, msg, _, _ = results_by_ticker[stock['ticker']]
                 if df is not None and score is not None:
-                    curr_price = df['Close'].iloc[-1]
-                    prev_price = df['Close'].iloc[-2] if len(df) > 1 else curr_price
+                    curr_price = df['Close'].iat[-1]
+                    prev_price = df['Close'].iat[-2] if len(df) > 1 else curr_price
                     change_rate = ((curr_price - prev_price) / prev_price * 100) if prev_price != 0 else 0
                     eval_val = curr_price * stock['quantity']
                     total_eval_value += eval_val
@@ -120,49 +125,61 @@ def run_rebalancing_tab(my_stocks):
         st.write("### 🛠️ 종목별 리밸런싱 전략")
         
         # 리스크 경고: 최대 보유 비중이 40% 이상인 경우
-        max_ratio = df_p['현재비중(%)'].max()
+        # idxmax 한 번으로 최대 비중 행을 찾음 (실수 == 비교로 부분 DataFrame 을 만들지 않음)
+        max_idx = df_p['현재비중(%)'].idxmax()
+        max_ratio = df_p.at[max_idx, '현재비중(%)']
         if max_ratio > 40:
-            st.warning(f"⚠️ **집중 위험 알림**: {df_p[df_p['현재비중(%)'] == max_ratio]['종목명'].values[0]} 종목에 {max_ratio:.1f}%가 집중되어 있습니다. 분산 투자를 권장합니다.")
+            max_name = df_p.at[max_idx, '종목명']
+            st.warning(f"⚠️ **집중 위험 알림**: {max_name} 종목에 {max_ratio:.1f}%가 집중되어 있습니다. 분산 투자를 권장합니다.")
         
-        for idx, row in df_p.iterrows():
-            adjustment = row['조정제안']
-            
-            # 조정 필요성에 따라 색상 구분
-            if adjustment > 5:
-                border_color = "🔥"
-                action_type = "비중 확대"
-            elif adjustment < -5:
-                border_color = "🚨"
-                action_type = "비중 축소"
-            else:
-                border_color = "⚖️"
-                action_type = "유지"
+        # 카드에 쓰는 열만 식별자 이름으로 바꾸고, 조정 필요성 아이콘·손익은 루프 전에 열 단위로 한 번에 계산
+        # → iterrows 처럼 행마다 Series 를 만들지 않고 itertuples 로 속성 접근
+        card_columns = {
+            '종목명': 'name',
+            '티커': 'ticker',
+            'AI점수': 'score',
+            '평가금액': 'eval_val',
+            '변화율': 'change',
+            '현재비중(%)': 'curr_pct',
+            '목표비중(%)': 'target_pct',
+            '조정제안': 'adj',
+            '조정금액': 'adj_amount',
+        }
+        adj = df_p['조정제안'].to_numpy()
+        df_view = df_p[list(card_columns)].rename(columns=card_columns).assign(
+            border=np.select([adj > 5, adj < -5], ["🔥", "🚨"], default="⚖️"),
+            profit_loss=df_p['평가금액'] * df_p['변화율'] / 100,
+        )
+
+        for row in df_view.itertuples(index=False):
+            adjustment = row.adj
+            border_color = row.border
             
             with st.container(border=True):
                 col_name, col_detail = st.columns([1.2, 2.8])
                 
                 # 좌측: 종목 정보
                 with col_name:
-                    st.markdown(f"### {border_color} {row['종목명']}")
-                    st.caption(f"티커: {row['티커']}")
-                    st.metric("AI 신뢰도", f"{row['AI점수']:.0f}점")
+                    st.markdown(f"### {border_color} {row.name}")
+                    st.caption(f"티커: {row.ticker}")
+                    st.metric("AI 신뢰도", f"{row.score:.0f}점")
                     
-                    profit_loss = row['평가금액'] * row['변화율'] / 100
+                    profit_loss = row.profit_loss
                     profit_icon = "📈" if profit_loss >= 0 else "📉"
                     st.metric(f"{profit_icon} 손익", f"{int(profit_loss):,}원")
                 
                 # 우측: 상세 조언
                 with col_detail:
-                    st.write(f"**현재 비중**: {row['현재비중(%)']:.1f}% (평가액: {int(row['평가금액']):,}원)")
-                    st.write(f"**목표 비중**: {row['목표비중(%)']:.1f}%")
-                    st.write(f"**조정 필요량**: {row['조정제안']:+.1f}% ({int(row['조정금액']):+,}원)")
+                    st.write(f"**현재 비중**: {row.curr_pct:.1f}% (평가액: {int(row.eval_val):,}원)")
+                    st.write(f"**목표 비중**: {row.target_pct:.1f}%")
+                    st.write(f"**조정 필요량**: {row.adj:+.1f}% ({int(row.adj_amount):+,}원)")
                     
                     # 조언 로직
                     if adjustment > 5:
-                        advice = f"🔥 **비중을 {abs(row['조정금액']):,.0f}원 추가 매수해봐요**: AI 점수 {row['AI점수']:.0f}점으로 강력하지만 현재 비중이 부족해. 큰손들의 평단가 위에서 매수세가 강하게 나가고 있으니 자금을 더 집중하는 게 현명할 거 같아."
+                        advice = f"🔥 **비중을 {abs(row.adj_amount):,.0f}원 추가 매수해봐요**: AI 점수 {row.score:.0f}점으로 강력하지만 현재 비중이 부족해. 큰손들의 평단가 위에서 매수세가 강하게 나가고 있으니 자금을 더 집중하는 게 현명할 거 같아."
                     elif adjustment < -5:
-                        reduction = abs(row['조정금액'])
-                        advice = f"🚨 **비중을 {int(reduction):,}원 정도 매도해봐요**: 현재 매수 강도가 약하거나 저항벽이 문제가 되고 있어. 수익(손실 방지)을 확정하고 더 강한 종목으로 갈아타는 게 낫겠어. 변화율이 {row['변화율']:+.2f}%인 만큼 타이밍을 잘 판단해봐."
+                        reduction = abs(row.adj_amount)
+                        advice = f"🚨 **비중을 {int(reduction):,}원 정도 매도해봐요**: 현재 매수 강도가 약하거나 저항벽이 문제가 되고 있어. 수익(손실 방지)을 확정하고 더 강한 종목으로 갈아타는 게 낫겠어. 변화율이 {row.change:+.2f}%인 만큼 타이밍을 잘 판단해봐."
                     else:
                         advice = f"⚖️ **지금은 보유가 최적이야**: 현재 비중이 이미 적절하게 배치되어 있어. 시장의 에너지와 흐름을 관망하면서 다음 변화 신호를 기다려. 무리한 조정은 하지 마."
                     
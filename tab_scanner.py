@@ -1,24 +1,20 @@
 import streamlit as st
 import re
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from engine import analyze_stock
 from pattern_finder import find_similar_patterns
-from market_data import get_all_krx_stocks
-from style_utils import apply_global_style
+from market_data import get_cached_analysis
 from stocks import STOCK_DICT
 
-# ─────────────────────────────────────────────
-# [역방향 매핑] 코드 → 종목명 변환 유틸리티 (검색 속도 최적화)
-# ─────────────────────────────────────────────
-TICKER_TO_NAME_MAP = {}
-for mkt, stocks in STOCK_DICT.items():
-    for name, code in stocks.items():
-        TICKER_TO_NAME_MAP[code] = name
+# 지표 차트는 최근 약 9개월(180봉)만 브라우저로 전송 - 전체 이력을 보내면 웹소켓 페이로드가 수 배로 커짐
+_CHART_BARS = 180
+# 공통 레이아웃: 전환 애니메이션·레인지슬라이더 끔 (uirevision 은 종목별로 _build_indicator_figures 에서 지정)
+_CHART_LAYOUT = dict(
+    height=250, margin=dict(l=0, r=0, t=20, b=0), hovermode='x unified',
+    transition_duration=0, xaxis_rangeslider_visible=False,
+)
 
-def get_name_from_ticker(ticker_code):
-    """티커(코드)를 입력하면 종목명을 반환, 없으면 코드 그대로 반환"""
-    return TICKER_TO_NAME_MAP.get(ticker_code, ticker_code)
 
 def _find_ticker_from_name(user_input):
     """한글 이름으로 종목 찾기 (모든 시장 검색)"""
@@ -31,46 +27,92 @@ def _find_ticker_from_name(user_input):
     
     return None, None
 
+@st.cache_resource(show_spinner=False)
+def _search_catalog():
+    """부분 검색용 종목 카탈로그 (시장, 종목명, 티커, 소문자 종목명, 소문자 티커, 표시 문자열) - 모든 세션 공유
+
+    검색창은 글자를 칠 때마다 rerun 되므로 시장 라벨·표시 문자열·소문자 변환을 매번 하지 않고
+    STOCK_DICT 순서 그대로 한 번만 만들어 둡니다. cache_resource 는 같은 객체를 돌려주므로 튜플로 반환.
+    """
+    catalog = []
+    for market, stocks in STOCK_DICT.items():
+        market_label = "🔵KOSPI" if market == "KOSPI" else "🟢KOSDAQ" if market == "KOSDAQ" else "🌎GLOBAL"
+        for name, ticker in stocks.items():
+            catalog.append((market, name, ticker, name.lower(), ticker.lower(), f"[{market_label}] {name} ({ticker})"))
+    return tuple(catalog)
+
 def _search_stocks(query, market_filter=None):
     """부분 검색: 입력된 텍스트를 포함하는 모든 종목 찾기 (시장 필터 지원)"""
     if not query or len(query.strip()) < 1:
         return []
     
     query = query.strip().lower()
-    results = []
-    
-    # 시장 필터가 있으면 해당 시장만, 없으면 전체 검색
-    if market_filter:
-        search_markets = {k: v for k, v in STOCK_DICT.items() if k in market_filter}
-    else:
-        search_markets = STOCK_DICT
-    
-    for market, stocks in search_markets.items():
-        for name, ticker in stocks.items():
-            # 한글 이름 또는 티커로 검색 (대소문자 무시)
-            if query in name.lower() or query in ticker.lower():
-                market_label = "🔵KOSPI" if market == "KOSPI" else "🟢KOSDAQ" if market == "KOSDAQ" else "🌎GLOBAL"
-                display_text = f"[{market_label}] {name} ({ticker})"
-                results.append({
-                    "name": name,
-                    "ticker": ticker,
-                    "display": display_text,
-                    "market": market
-                })
     
-    # 중복 제거 및 정렬
+    # 시장 필터가 있으면 해당 시장만, 없으면 전체 검색 + 중복 티커는 먼저 나온 시장 것만
     seen = set()
     unique_results = []
-    for item in results:
-        key = item['ticker']
-        if key not in seen:
-            seen.add(key)
-            unique_results.append(item)
+    for market, name, ticker, name_lower, ticker_lower, display_text in _search_catalog():
+        if market_filter and market not in market_filter:
+            continue
+        # 한글 이름 또는 티커로 검색 (대소문자 무시)
+        if (query in name_lower or query in ticker_lower) and ticker not in seen:
+            seen.add(ticker)
+            unique_results.append({
+                "name": name,
+                "ticker": ticker,
+                "display": display_text,
+                "market": market
+            })
     
     return sorted(unique_results, key=lambda x: x['name'])
 
+def _build_indicator_figures(df, ticker):
+    """정밀 분석 지표 차트 4종 생성 (RSI/MFI, MACD, 밴드, 거래량/VWAP) - 최근 _CHART_BARS 봉만 그림"""
+    # 차트용 꼬리 구간 (지표 값은 전체 이력으로 계산된 것을 그대로 잘라 씀)
+    dfv = df.iloc[-_CHART_BARS:]
+    # uirevision=ticker: 같은 종목을 다시 그릴 때만 줌/팬 상태 유지, 종목이 바뀌면 초기 화면으로
+
+    # RSI + MFI
+    fig_rsi = make_subplots(specs=[[{"secondary_y": False}]])
+    fig_rsi.add_trace(go.Scatter(x=dfv.index, y=dfv['rsi'], name='RSI', line=dict(color='#ff6b6b')), secondary_y=False)
+    fig_rsi.add_trace(go.Scatter(x=dfv.index, y=dfv['mfi'], name='MFI', line=dict(color='#4ecdc4')), secondary_y=False)
+    fig_rsi.add_hline(y=70, line_dash="dash", line_color="#ff6b6b", annotation_text="과매수", secondary_y=False)
+    fig_rsi.add_hline(y=30, line_dash="dash", line_color="#4ecdc4", annotation_text="과매도", secondary_y=False)
+    fig_rsi.update_layout(**_CHART_LAYOUT, uirevision=ticker)
+
+    # MACD - 히스토그램은 엔진이 계산해 둔 macd_diff 열, 막대 색은 불리언 마스크로 한 번에
+    # (tolist: 문자열 ndarray 를 넘기면 plotly 가 x 축 날짜를 더 긴 형식으로 직렬화함)
+    fig_macd = make_subplots(specs=[[{"secondary_y": False}]])
+    fig_macd.add_trace(go.Bar(x=dfv.index, y=dfv['macd_diff'], name='MACD Histogram',
+                              marker_color=np.where(dfv['macd_diff'].to_numpy() > 0, '#ff6b6b', '#4ecdc4').tolist()),
+                      secondary_y=False)
+    fig_macd.add_trace(go.Scatter(x=dfv.index, y=dfv['macd'], name='MACD', line=dict(color='#ffa500')), secondary_y=False)
+    fig_macd.add_trace(go.Scatter(x=dfv.index, y=dfv['macd_sig'], name='Signal', line=dict(color='#95e1d3')), secondary_y=False)
+    fig_macd.update_layout(**_CHART_LAYOUT, uirevision=ticker)
+
+    # 밴드 + 가격 (롤링 극값은 전체 이력으로 계산 후 자름)
+    bb_upper = df['High'].rolling(20).max().iloc[-_CHART_BARS:]
+    bb_lower = df['Low'].rolling(20).min().iloc[-_CHART_BARS:]
+
+    fig_bb = go.Figure()
+    fig_bb.add_trace(go.Scatter(x=dfv.index, y=bb_upper, name='BB Upper', line=dict(color='rgba(255,107,107,0.4)')))
+    fig_bb.add_trace(go.Scatter(x=dfv.index, y=bb_lower, name='BB Lower', line=dict(color='rgba(255,107,107,0.4)'), 
+                                fill='tonexty'))
+    fig_bb.add_trace(go.Scatter(x=dfv.index, y=dfv['Close'], name='가격', line=dict(color='#1f77b4')))
+    fig_bb.update_layout(**_CHART_LAYOUT, uirevision=ticker)
+
+    # Volume + VWAP
+    fig_vol = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_vol.add_trace(go.Bar(x=dfv.index, y=dfv['Volume'], name='Volume', 
+                            marker_color=np.where(dfv['Close'].to_numpy() > dfv['Open'].to_numpy(), '#ff6b6b', '#4ecdc4').tolist()),
+                    secondary_y=False)
+    fig_vol.add_trace(go.Scatter(x=dfv.index, y=dfv['vwap'], name='VWAP', 
+                                line=dict(color='#ffa500')), secondary_y=True)
+    fig_vol.update_layout(**_CHART_LAYOUT, uirevision=ticker)
+
+    return fig_rsi, fig_macd, fig_bb, fig_vol
+
 def run_scanner_tab(unused_stock_dict):
-    apply_global_style()
     
     # 고급 스타일링
     st.markdown("""
@@ -230,11 +272,12 @@ def run_scanner_tab(unused_stock_dict):
         progress_placeholder.info("🔄 분석 중... 데이터 수집 → 지표 계산 → 신호 생성")
         
         try:
-            result = analyze_stock(target_ticker, apply_fundamental=True)
+            # 같은 종목을 다시 분석하면 15분 캐시에서 바로 반환 (실패 결과는 캐시하지 않음)
+            result = get_cached_analysis(target_ticker, apply_fundamental=True)
 
             # 🚨 엔진이 None DataFrame을 뱉었을 경우 — 재무제표 제외 후 1회 재시도
             if result[0] is None or (hasattr(result[0], 'empty') and result[0].empty):
-                result = analyze_stock(target_ticker, apply_fundamental=False)
+                result = get_cached_analysis(target_ticker, apply_fundamental=False)
 
             progress_placeholder.empty()
             
@@ -272,7 +315,9 @@ def run_scanner_tab(unused_stock_dict):
                         </div>""", unsafe_allow_html=True)
                     
                     with m2:
-                        current_price = int(df['Close'].iloc[-1]) if df['Close'].iloc[-1] > 100 else round(df['Close'].iloc[-1], 2)
+                        # 최신 종가는 한 번만 읽어 재사용 (.iat: 라벨 인덱서를 거치지 않는 위치 스칼라 접근)
+                        last_close = df['Close'].iat[-1]
+                        current_price = int(last_close) if last_close > 100 else round(last_close, 2)
                         st.markdown(f"""<div class='metric-card'>
                         <div class='metric-label'>💹 현재가</div>
                         <div class='metric-value' style='font-size: 1.8rem;'>{current_price:,}</div>
@@ -326,16 +371,24 @@ def run_scanner_tab(unused_stock_dict):
                     st.markdown("### 🗂️ The Closer's 정밀 타격 분석 (지표 그룹화)")
                     
                     # 최신 지표 값 추출
-                    rsi_val = df['rsi'].iloc[-1]
-                    mfi_val = df['mfi'].iloc[-1]
-                    macd_val = df['macd'].iloc[-1]
-                    macd_sig_val = df['macd_sig'].iloc[-1]
-                    ichi_a_val = df['ichi_a'].iloc[-1]
-                    ichi_b_val = df['ichi_b'].iloc[-1]
-                    vwap_val = df['vwap'].iloc[-1]
-                    volume_latest = df['Volume'].iloc[-1]
+                    rsi_val = df['rsi'].iat[-1]
+                    mfi_val = df['mfi'].iat[-1]
+                    macd_val = df['macd'].iat[-1]
+                    macd_sig_val = df['macd_sig'].iat[-1]
+                    ichi_a_val = df['ichi_a'].iat[-1]
+                    ichi_b_val = df['ichi_b'].iat[-1]
+                    vwap_val = df['vwap'].iat[-1]
+                    volume_latest = df['Volume'].iat[-1]
                     volume_avg = df['Volume'].rolling(20).mean().iloc[-1]
-                    atr_val = df['atr'].iloc[-1]
+                    atr_val = df['atr'].iat[-1]
+                    # 같은 종목·같은 마지막 봉으로 다시 분석하면 Plotly 객체를 새로 만들지 않고 세션에 둔 것을 재사용
+                    # (전체 프레임 해시 대신 마지막 봉 식별자로 키 → O(1), 키 하나에 마지막 차트 묶음만 보관)
+                    fig_key = (target_ticker, df.index[-1], len(df), float(last_close))
+                    cached = st.session_state.get("scanner_figs")
+                    if cached is None or cached[0] != fig_key:
+                        cached = (fig_key, _build_indicator_figures(df, target_ticker))
+                        st.session_state["scanner_figs"] = cached
+                    fig_rsi, fig_macd, fig_bb, fig_vol = cached[1]
                     
                     # --- 1️⃣ [엔진 온도] 모멘텀 및 과열 진단 ---
                     st.markdown("#### 1️⃣ [엔진 온도] 모멘텀 및 과열 진단")
@@ -382,12 +435,6 @@ def run_scanner_tab(unused_stock_dict):
                     
                     with right_col:
                         # RSI + MFI 차트
-                        fig_rsi = make_subplots(specs=[[{"secondary_y": False}]])
-                        fig_rsi.add_trace(go.Scatter(x=df.index, y=df['rsi'], name='RSI', line=dict(color='#ff6b6b')), secondary_y=False)
-                        fig_rsi.add_trace(go.Scatter(x=df.index, y=df['mfi'], name='MFI', line=dict(color='#4ecdc4')), secondary_y=False)
-                        fig_rsi.add_hline(y=70, line_dash="dash", line_color="#ff6b6b", annotation_text="과매수", secondary_y=False)
-                        fig_rsi.add_hline(y=30, line_dash="dash", line_color="#4ecdc4", annotation_text="과매도", secondary_y=False)
-                        fig_rsi.update_layout(height=250, margin=dict(l=0, r=0, t=20, b=0), hovermode='x unified')
                         st.plotly_chart(fig_rsi, use_container_width=True)
                     
                     st.write("---")
@@ -413,13 +460,6 @@ def run_scanner_tab(unused_stock_dict):
                     
                     with right_col:
                         # MACD + Ichimoku 차트
-                        fig_macd = make_subplots(specs=[[{"secondary_y": False}]])
-                        fig_macd.add_trace(go.Bar(x=df.index, y=df['macd'] - df['macd_sig'], name='MACD Histogram',
-                                                  marker_color=['#ff6b6b' if v > 0 else '#4ecdc4' for v in df['macd'] - df['macd_sig']]),
-                                          secondary_y=False)
-                        fig_macd.add_trace(go.Scatter(x=df.index, y=df['macd'], name='MACD', line=dict(color='#ffa500')), secondary_y=False)
-                        fig_macd.add_trace(go.Scatter(x=df.index, y=df['macd_sig'], name='Signal', line=dict(color='#95e1d3')), secondary_y=False)
-                        fig_macd.update_layout(height=250, margin=dict(l=0, r=0, t=20, b=0), hovermode='x unified')
                         st.plotly_chart(fig_macd, use_container_width=True)
                     
                     st.write("---")
@@ -431,7 +471,7 @@ def run_scanner_tab(unused_stock_dict):
                     left_col, right_col = st.columns([1.2, 1])
                     
                     with left_col:
-                        current_price = df['Close'].iloc[-1]
+                        current_price = last_close
                         bb_higher_val = df['High'].rolling(20).max().iloc[-1]
                         bb_lower_val = df['Low'].rolling(20).min().iloc[-1]
                         bb_position = "상단 근처" if current_price > (bb_higher_val + bb_lower_val) / 2 else "하단 근처" if current_price < (bb_higher_val + bb_lower_val) / 2 else "중간권역"
@@ -451,16 +491,6 @@ def run_scanner_tab(unused_stock_dict):
                     
                     with right_col:
                         # BB + ATR 차트
-                        bb_upper = df['High'].rolling(20).max()
-                        bb_lower = df['Low'].rolling(20).min()
-                        bb_mid = (bb_upper + bb_lower) / 2
-                        
-                        fig_bb = go.Figure()
-                        fig_bb.add_trace(go.Scatter(x=df.index, y=bb_upper, name='BB Upper', line=dict(color='rgba(255,107,107,0.4)')))
-                        fig_bb.add_trace(go.Scatter(x=df.index, y=bb_lower, name='BB Lower', line=dict(color='rgba(255,107,107,0.4)'), 
-                                                    fill='tonexty'))
-                        fig_bb.add_trace(go.Scatter(x=df.index, y=df['Close'], name='가격', line=dict(color='#1f77b4')))
-                        fig_bb.update_layout(height=250, margin=dict(l=0, r=0, t=20, b=0), hovermode='x unified')
                         st.plotly_chart(fig_bb, use_container_width=True)
                     
                     st.write("---")
@@ -509,14 +539,6 @@ def run_scanner_tab(unused_stock_dict):
                     
                     with right_col:
                         # Volume + VWAP 차트
-                        fig_vol = make_subplots(specs=[[{"secondary_y": True}]])
-                        fig_vol.add_trace(go.Bar(x=df.index, y=df['Volume'], name='Volume', 
-                                                marker_color=['#ff6b6b' if c > o else '#4ecdc4' 
-                                                             for c, o in zip(df['Close'], df['Open'])]),
-                                        secondary_y=False)
-                        fig_vol.add_trace(go.Scatter(x=df.index, y=df['vwap'], name='VWAP', 
-                                                    line=dict(color='#ffa500')), secondary_y=True)
-                        fig_vol.update_layout(height=250, margin=dict(l=0, r=0, t=20, b=0), hovermode='x unified')
                         st.plotly_chart(fig_vol, use_container_width=True)
 
                     # ... (기존 The Closer's 최종 판정 및 기술지표 분석 출력 코드들) ...
@@ -22,7 +22,7 @@ import numpy as np
 import pandas as pd
 import pytest
 
-from engine_v2 import (
+from engine import (
     AnalysisResult,
     DataClient,
     DataFetchError,
@@ -32,6 +32,8 @@ from engine_v2 import (
     IndicatorSnapshot,
     InsufficientDataError,
     StockAnalyzer,
+    analyze_stock_df,
+    analyze_stocks_batch,
     calculate_sharp_score,
     score_bb,
     score_ichimoku,
@@ -374,13 +376,35 @@ class TestIndicatorEngine:
         expected = {"rsi", "mfi", "bb_lower", "bb_upper", "macd", "ichi_a", "ichi_b", "vwap", "atr"}
         assert expected.issubset(set(df_out.columns))
 
+    def test_indicator_columns_contiguous(self, sample_df):
+        """지표 컬럼은 한 블록으로 붙고 각 컬럼이 연속 메모리."""
+        _, df_out = IndicatorEngine().compute(sample_df, curr_price=100.0)
+        for col in ("rsi", "macd", "vwap", "atr"):
+            assert df_out[col].to_numpy().flags["C_CONTIGUOUS"]
+        assert list(df_out.columns[: len(sample_df.columns)]) == list(sample_df.columns)
+
+    def test_recompute_does_not_duplicate_columns(self, sample_df):
+        ie = IndicatorEngine()
+        _, once = ie.compute(sample_df, curr_price=100.0)
+        _, twice = ie.compute(once, curr_price=100.0)
+        assert not twice.columns.duplicated().any()
+        assert list(twice.columns) == list(once.columns)
+
     def test_rsi_fallback_no_ta(self, sample_df, monkeypatch):
         """ta 라이브러리 없이도 RSI 계산 가능 (수동 구현 폴백)."""
-        monkeypatch.setattr("engine_v2._TA_AVAILABLE", False)
+        monkeypatch.setattr("engine._TA_AVAILABLE", False)
         ie = IndicatorEngine()
         snap, _ = ie.compute(sample_df, curr_price=100.0)
         assert 0.0 <= snap.rsi <= 100.0
 
+    def test_atr_matches_ta(self, sample_df):
+        """ATR 루프 커널이 ta.AverageTrueRange 와 수치적으로 동일."""
+        ta_vol = pytest.importorskip("ta.volatility")
+        h, l, c = sample_df["High"], sample_df["Low"], sample_df["Close"]
+        expected = ta_vol.AverageTrueRange(high=h, low=l, close=c, window=14).average_true_range()
+        got = IndicatorEngine()._atr(h, l, c)
+        assert np.allclose(got.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=0)
+
 
 # ─────────────────────────────────────────────
 # 4. DataClient 단위 테스트 (mock)
@@ -418,7 +442,7 @@ class TestDataClient:
         mock_ticker.ticker = "SHORT"
         mock_ticker.history.return_value = short_df
 
-        with patch("engine_v2.yf.Ticker", return_value=mock_ticker):
+        with patch("engine.yf.Ticker", return_value=mock_ticker):
             client = DataClient()
             with pytest.raises(InsufficientDataError):
                 client.fetch("SHORT")
@@ -429,11 +453,96 @@ class TestDataClient:
         mock_ticker.ticker = "NETERR"
         mock_ticker.history.side_effect = ConnectionError("timeout")
 
-        with patch("engine_v2.yf.Ticker", return_value=mock_ticker):
+        with patch("engine.yf.Ticker", return_value=mock_ticker):
             client = DataClient()
             with pytest.raises((DataFetchError, InsufficientDataError)):
                 client.fetch("NETERR")
 
+    def _make_batch_raw(self, tickers, n: int = 60) -> pd.DataFrame:
+        """yf.download(group_by='ticker') 형태의 MultiIndex 컬럼 DataFrame."""
+        frames = {}
+        for t in tickers:
+            df = self._make_good_df(n)
+            df["Open"] = df["Close"]
+            frames[t] = df
+        return pd.concat(frames, axis=1)
+
+    def test_fetch_many_splits_batch_per_ticker(self):
+        raw = self._make_batch_raw(["AAA", "BBB"])
+        with patch("yfinance.download", return_value=raw) as mock_dl:
+            frames = DataClient().fetch_many(["AAA", "BBB", "MISSING"])
+
+        mock_dl.assert_called_once()
+        assert set(frames) == {"AAA", "BBB"}
+        assert len(frames["AAA"]) == 60
+        assert "Close" in frames["BBB"].columns
+
+    def test_fetch_many_chunks_requests(self):
+        tickers = [f"T{i}" for i in range(DataClient.BATCH_SIZE + 5)]
+
+        def fake_download(symbols, **kwargs):
+            return self._make_batch_raw(symbols, n=30)
+
+        with patch("yfinance.download", side_effect=fake_download) as mock_dl:
+            frames = DataClient().fetch_many(tickers)
+
+        assert mock_dl.call_count == 2
+        assert [len(c.args[0]) for c in mock_dl.call_args_list] == [DataClient.BATCH_SIZE, 5]
+        assert set(frames) == set(tickers)
+
+    def test_fetch_many_drops_short_and_failed(self):
+        raw = self._make_batch_raw(["AAA"], n=5)
+        with patch("yfinance.download", return_value=raw):
+            assert DataClient().fetch_many(["AAA"]) == {}
+        with patch("yfinance.download", side_effect=ConnectionError("timeout")):
+            assert DataClient().fetch_many(["AAA"]) == {}
+
+
+# ─────────────────────────────────────────────
+# 4-1. analyze_stock_df (네트워크 없는 분석 경로)
+# ─────────────────────────────────────────────
+
+class TestAnalyzeStockDf:
+
+    def test_returns_legacy_tuple(self, sample_df):
+        df_ind, score, verdict, details, stop_loss = analyze_stock_df(sample_df, "TEST")
+        assert not df_ind.empty
+        assert 0.0 <= score <= 100.0
+        assert isinstance(verdict, str) and verdict
+        assert details[-1]["title"] == "🎯 The Closer's 실시간 의견"
+        assert stop_loss == pytest.approx(sample_df["Close"].iloc[-1] * 0.90)
+
+    def test_empty_df_never_returns_none(self):
+        df_ind, score, verdict, details, stop_loss = analyze_stock_df(pd.DataFrame(), "EMPTY")
+        assert df_ind.empty
+        assert score == 0.0
+        assert details == []
+
+
+class TestAnalyzeStocksBatch:
+
+    def test_uses_given_frames_without_download(self, sample_df):
+        with patch.object(DataClient, "fetch_many") as fetch_many:
+            out = analyze_stocks_batch(["A", "B"], frames={"A": sample_df, "B": sample_df})
+        fetch_many.assert_not_called()
+        assert list(out) == ["A", "B"]
+        assert out["A"][1] == analyze_stock_df(sample_df, "A")[1]
+
+    def test_missing_ticker_falls_back_to_single_fetch(self, sample_df):
+        with patch.object(DataClient, "fetch", side_effect=DataFetchError("gone")) as fetch:
+            out = analyze_stocks_batch(["A", "GONE"], frames={"A": sample_df})
+        fetch.assert_called_once_with("GONE", "1y")
+        assert not out["A"][0].empty
+        assert out["GONE"][0].empty and out["GONE"][1] == 0.0
+
+    def test_parallel_fallback_keeps_order_and_results(self, sample_df):
+        tickers = [f"T{i}" for i in range(6)]
+        with patch.object(DataClient, "fetch", return_value=sample_df):
+            parallel = analyze_stocks_batch(tickers, frames={}, max_workers=4)
+            serial = analyze_stocks_batch(tickers, frames={}, max_workers=1)
+        assert list(parallel) == tickers
+        assert [r[1] for r in parallel.values()] == [r[1] for r in serial.values()]
+
 
 # ─────────────────────────────────────────────
 # 5. StockAnalyzer 통합 테스트 (full mock)
@@ -468,7 +577,7 @@ class TestStockAnalyzer:
         )
         mock_ind.compute.return_value = (snap, sample_df)
 
-        with patch("engine_v2.yf.Ticker") as mock_yf:
+        with patch("engine.yf.Ticker") as mock_yf:
             mock_yf.return_value.fast_info.last_price = 98.0
             az = StockAnalyzer("AAPL", data_client=mock_client, indicator_engine=mock_ind)
             result = az.analyze()
@@ -519,7 +628,7 @@ class TestStockAnalyzer:
         )
         mock_ind.compute.return_value = (snap, sample_df)
 
-        with patch("engine_v2.yf.Ticker") as mock_yf:
+        with patch("engine.yf.Ticker") as mock_yf:
             mock_yf.return_value.fast_info.last_price = 90.0
             az = StockAnalyzer("TEST", data_client=mock_client, indicator_engine=mock_ind)
             result = az.analyze()
@@ -542,7 +651,7 @@ class TestStockAnalyzer:
         )
         mock_ind.compute.return_value = (snap, sample_df)
 
-        with patch("engine_v2.yf.Ticker") as mock_yf:
+        with patch("engine.yf.Ticker") as mock_yf:
             mock_yf.return_value.fast_info.last_price = 110.0
             az = StockAnalyzer("TEST", data_client=mock_client, indicator_engine=mock_ind)
             result = az.analyze()
@@ -568,7 +677,7 @@ class TestStockAnalyzer:
             penalty=20.0, messages=["EPS 마이너스 -20점"]
         )
 
-        with patch("engine_v2.yf.Ticker") as mock_yf:
+        with patch("engine.yf.Ticker") as mock_yf:
             mock_yf.return_value.fast_info.last_price = 98.0
             az = StockAnalyzer(
                 "TEST", data_client=mock_client,
@@ -593,7 +702,7 @@ class TestStockAnalyzer:
         )
         mock_ind.compute.return_value = (snap, sample_df)
 
-        with patch("engine_v2.yf.Ticker") as mock_yf:
+        with patch("engine.yf.Ticker") as mock_yf:
             mock_yf.return_value.fast_info.last_price = 100.0
             az = StockAnalyzer("TEST", data_client=mock_client, indicator_engine=mock_ind)
             result = az.analyze()
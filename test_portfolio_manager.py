@@ -0,0 +1,311 @@
+"""
+test_portfolio_manager.py — portfolio_manager pytest 테스트 스위트
+==================================================================
+실행: .venv/bin/python3 -m pytest test_portfolio_manager.py -v
+"""
+from __future__ import annotations
+
+import json
+from typing import Dict
+
+import pytest
+
+import portfolio_manager as pm
+
+
+# ─────────────────────────────────────────────
+# 공통 픽스처
+# ─────────────────────────────────────────────
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """portfolio_<uid>.json 은 상대 경로로 저장되므로 임시 디렉터리에서 실행."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _entry(ticker: str = "005930.KS", **overrides) -> Dict:
+    entry = {
+        "name": "삼성전자",
+        "ticker": ticker,
+        "quantity": 10,
+        "buy_price": 70000,
+        "buy_date": "2024-01-02",
+    }
+    entry.update(overrides)
+    return entry
+
+
+# ─────────────────────────────────────────────
+# 1. import_portfolio (스트리밍 파싱)
+# ─────────────────────────────────────────────
+
+class TestImportPortfolio:
+
+    def test_roundtrip(self):
+        data = json.dumps([_entry(), _entry("AAPL", name="Apple")])
+        ok, _ = pm.import_portfolio("u1", data)
+        assert ok
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["005930.KS", "AAPL"]
+
+    def test_empty_array(self):
+        ok, _ = pm.import_portfolio("u1", " [ ] ")
+        assert ok
+        assert pm.load_portfolio("u1") == []
+
+    def test_invalid_row_fails_fast(self):
+        data = json.dumps([_entry(), _entry(quantity=-1)])
+        ok, msg = pm.import_portfolio("u1", data)
+        assert not ok
+        assert msg.startswith("항목 1:")
+        assert pm.load_portfolio("u1") == []
+
+    def test_not_an_array(self):
+        ok, msg = pm.import_portfolio("u1", json.dumps(_entry()))
+        assert not ok
+        assert msg == "유효한 포트폴리오 형식이 아닙니다."
+
+    @pytest.mark.parametrize("data", ["[", "{bad", "[{}, x]", "[] trailing"])
+    def test_malformed_json(self, data):
+        ok, msg = pm.import_portfolio("u1", data)
+        assert not ok
+
+    def test_iter_json_array_matches_json_loads(self):
+        data = '\n [1, {"a": [1, 2]}, "x", null] \n'
+        assert list(pm._iter_json_array(data)) == json.loads(data)
+
+
+# ─────────────────────────────────────────────
+# 2. 사용자 잠금 (_with_user_lock)
+# ─────────────────────────────────────────────
+
+class TestUserLock:
+
+    def test_lock_is_reentrant_in_same_thread(self):
+        with pm._with_user_lock("u1"):
+            with pm._with_user_lock("u1"):
+                assert pm.save_portfolio("u1", [_entry()])
+        assert len(pm.load_portfolio("u1")) == 1
+
+    def test_concurrent_adds_are_not_lost(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        tickers = [f"T{i:03d}" for i in range(40)]
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            results = list(ex.map(
+                lambda t: pm.add_stock("u1", t, t, 1, 100, "2024-01-02"), tickers
+            ))
+
+        assert all(ok for ok, _ in results)
+        assert sorted(s["ticker"] for s in pm.load_portfolio("u1")) == tickers
+
+    def test_save_leaves_no_temp_file(self, workdir):
+        assert pm.save_portfolio("u1", [_entry()])
+        assert not (workdir / "portfolio_u1.json.tmp").exists()
+
+    def test_new_file_created_and_updated_timestamps_match(self, workdir):
+        assert pm.save_portfolio("u1", [_entry()])
+        meta = json.loads((workdir / "portfolio_u1.json").read_text(encoding="utf-8"))["metadata"]
+        assert meta["created_at"] == meta["updated_at"]
+
+
+# ─────────────────────────────────────────────
+# 3. 포트폴리오 분석 (analyze_portfolio)
+# ─────────────────────────────────────────────
+
+class TestAnalyzePortfolio:
+
+    def test_empty_portfolio(self):
+        stats, composition = pm.analyze_portfolio("u1", {})
+        assert stats == {
+            "total_invest": 0,
+            "current_value": 0,
+            "profit_loss": 0,
+            "profit_loss_rate": 0,
+            "stock_count": 0,
+        }
+        assert composition == []
+
+    def test_stats_and_composition_in_one_pass(self):
+        pm.save_portfolio("u1", [
+            _entry("A", quantity=10, buy_price=100),
+            _entry("B", quantity=5, buy_price=200),
+        ])
+        stats, composition = pm.analyze_portfolio("u1", {"A": 150})
+
+        # B 는 시세가 없으므로 매입가로 평가
+        assert stats["total_invest"] == 2000
+        assert stats["current_value"] == 2500
+        assert stats["profit_loss_rate"] == pytest.approx(25.0)
+        assert [c["ticker"] for c in composition] == ["A", "B"]
+        assert composition[0]["ratio"] == pytest.approx(60.0)
+        assert composition[0]["profit_loss"] == 500
+
+    def test_legacy_wrappers_match(self):
+        pm.save_portfolio("u1", [_entry("A"), _entry("B", quantity=3)])
+        prices = {"A": 71000, "B": 69000}
+        stats, composition = pm.analyze_portfolio("u1", prices)
+        assert pm.calculate_portfolio_stats("u1", prices) == stats
+        assert pm.get_portfolio_composition("u1", prices) == composition
+
+
+# ─────────────────────────────────────────────
+# 4. export_portfolio (CSV)
+# ─────────────────────────────────────────────
+
+class TestExportCsv:
+
+    def test_matches_csv_dictwriter(self):
+        import csv
+        from io import StringIO
+
+        stocks = [
+            _entry("005930.KS"),
+            _entry("AAPL", name='Apple, "Inc"', quantity=1.5, currency="USD"),
+            _entry("TSLA", name="Tesla\nMotors", currency=None),
+        ]
+        stocks[0]["currency"] = "KRW"
+        pm.save_portfolio("u1", stocks)
+
+        expected = StringIO()
+        writer = csv.DictWriter(expected, fieldnames=stocks[0].keys())
+        writer.writeheader()
+        writer.writerows(stocks)
+
+        assert pm.export_portfolio("u1", "csv") == expected.getvalue()
+
+    def test_mixed_entries_use_union_of_keys(self):
+        import csv
+        from io import StringIO
+
+        # 국내 항목(통화 필드 없음)이 먼저 오고 해외 항목이 뒤에 오는 경우
+        stocks = [
+            _entry("005930.KS"),
+            _entry("AAPL", name="Apple", buy_price=150.5, currency="USD", exchange_rate=1350.0),
+        ]
+        pm.save_portfolio("u1", stocks)
+
+        out = pm.export_portfolio("u1", "csv")
+        rows = list(csv.DictReader(StringIO(out)))
+
+        assert list(rows[0].keys()) == [
+            "name", "ticker", "quantity", "buy_price", "buy_date", "currency", "exchange_rate",
+        ]
+        assert rows[0]["currency"] == "" and rows[0]["exchange_rate"] == ""
+        assert rows[1]["currency"] == "USD" and rows[1]["exchange_rate"] == "1350.0"
+
+    def test_empty_portfolio_returns_none(self):
+        assert pm.export_portfolio("u1", "csv") is None
+
+
+# ─────────────────────────────────────────────
+# 5. load_portfolio (mmap / orjson 빠른 경로)
+# ─────────────────────────────────────────────
+
+class TestLoadFastPath:
+
+    def test_large_file_roundtrip(self):
+        stocks = [_entry(f"T{i:04d}", name=f"종목{i}") for i in range(200)]
+        assert pm.save_portfolio("u1", stocks)
+        assert pm.load_portfolio("u1") == stocks
+
+    def test_stdlib_fallback(self, monkeypatch):
+        monkeypatch.setattr(pm, "_ORJSON_AVAILABLE", False)
+        stocks = [_entry(f"T{i:04d}") for i in range(200)]
+        assert pm.save_portfolio("u1", stocks)
+        assert pm.load_portfolio("u1") == stocks
+
+    def test_corrupted_file_returns_empty(self, workdir):
+        (workdir / "portfolio_u1.json").write_bytes(b"{not json")
+        assert pm.load_portfolio("u1") == []
+
+
+# ─────────────────────────────────────────────
+# 6. 추가 전용 변경 로그 (append / tombstone)
+# ─────────────────────────────────────────────
+
+class TestAppendLog:
+
+    def test_append_and_tombstone_replay(self, workdir):
+        assert pm.save_portfolio("u1", [_entry("A"), _entry("B")])
+        assert pm.append_portfolio_entry("u1", _entry("C"))
+        assert pm.append_portfolio_tombstone("u1", _entry("A"))
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["B", "C"]
+        # 스냅샷은 그대로, 변경분은 로그에만
+        snapshot = json.loads((workdir / "portfolio_u1.json").read_text(encoding="utf-8"))
+        assert [s["ticker"] for s in snapshot["stocks"]] == ["A", "B"]
+
+    def test_log_without_snapshot(self):
+        assert pm.append_portfolio_entry("u1", _entry("A"))
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["A"]
+
+    def test_full_save_absorbs_log(self, workdir):
+        assert pm.append_portfolio_entry("u1", _entry("A"))
+        assert pm.save_portfolio("u1", pm.load_portfolio("u1"))
+        assert not (workdir / "portfolio_u1.json.log").exists()
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["A"]
+
+    def test_compaction_over_threshold(self, workdir, monkeypatch):
+        monkeypatch.setattr(pm, "_LOG_COMPACT_BYTES", 200)
+        for i in range(5):
+            assert pm.append_portfolio_entry("u1", _entry(f"T{i}"))
+        assert (workdir / "portfolio_u1.json").exists()
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == [f"T{i}" for i in range(5)]
+
+    def test_invalid_entry_rejected(self, workdir):
+        assert not pm.append_portfolio_entry("u1", _entry(quantity=0))
+        assert not pm.append_portfolio_tombstone("u1", {"name": "x"})
+        assert not (workdir / "portfolio_u1.json.log").exists()
+
+    def test_torn_line_and_missing_target_skipped(self, workdir):
+        assert pm.append_portfolio_entry("u1", _entry("A"))
+        assert pm.append_portfolio_tombstone("u1", _entry("Z"))
+        with open(workdir / "portfolio_u1.json.log", "a", encoding="utf-8") as f:
+            f.write('{"op": "add", "ent')
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["A"]
+
+    def test_tombstone_matches_identity_not_position(self):
+        # 세션 목록 기준으로는 0번째였던 A 를 지웠지만, 그 사이 저장된 목록은 순서가 다름
+        assert pm.save_portfolio("u1", [_entry("B"), _entry("A")])
+        assert pm.append_portfolio_tombstone("u1", _entry("A"))
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["B"]
+
+    def test_tombstone_removes_one_of_identical_lots(self):
+        assert pm.save_portfolio("u1", [_entry("A"), _entry("A", buy_price=80000), _entry("A")])
+        assert pm.append_portfolio_tombstone("u1", _entry("A"))
+        assert [s["buy_price"] for s in pm.load_portfolio("u1")] == [80000, 70000]
+
+    def test_legacy_index_tombstone_replayed(self, workdir):
+        assert pm.save_portfolio("u1", [_entry("A"), _entry("B")])
+        with open(workdir / "portfolio_u1.json.log", "a", encoding="utf-8") as f:
+            f.write('{"op": "del", "index": 0}\n')
+        assert [s["ticker"] for s in pm.load_portfolio("u1")] == ["B"]
+
+    def test_delete_portfolio_removes_log(self, workdir):
+        assert pm.append_portfolio_entry("u1", _entry("A"))
+        ok, _ = pm.delete_portfolio("u1")
+        assert ok
+        assert pm.load_portfolio("u1") == []
+
+    def test_load_waits_for_save_to_drop_absorbed_log(self, monkeypatch):
+        import threading
+
+        assert pm.save_portfolio("u1", [_entry("A")])
+        assert pm.append_portfolio_entry("u1", _entry("B"))
+
+        # 스냅샷 교체 직후 · 로그 삭제 직전에 다른 스레드가 로드 → 잠금 때문에 로그 삭제 후에 읽어야 함
+        real_remove = pm._remove_log
+        loaded = []
+
+        def remove_with_concurrent_load(user_id):
+            reader = threading.Thread(target=lambda: loaded.append(pm.load_portfolio(user_id)))
+            reader.start()
+            reader.join(timeout=0.2)
+            assert reader.is_alive()
+            real_remove(user_id)
+            remove_with_concurrent_load.reader = reader
+
+        monkeypatch.setattr(pm, "_remove_log", remove_with_concurrent_load)
+        assert pm.save_portfolio("u1", pm.load_portfolio("u1"))
+        remove_with_concurrent_load.reader.join()
+        assert [s["ticker"] for s in loaded[0]] == ["A", "B"]
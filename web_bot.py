@@ -1,3 +1,4 @@
+import logging
 import streamlit as st
 import datetime
 from datetime import timedelta
@@ -12,6 +13,12 @@ from style_utils import apply_global_style
 from auth_manager import save_user
 from auto_auth import AutoLoginClient, SessionError, CredentialsMissingError
 
+# 로깅 설정은 라이브러리 모듈이 아닌 앱 진입점에서 1회
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
 # ─────────────────────────────────────────────
 # 브라우저 쿠키 + 자동 로그인 설정
 # ─────────────────────────────────────────────